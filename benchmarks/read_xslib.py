@@ -0,0 +1,109 @@
+#-*-coding: UTF-8 -*-
+"""
+Benchmark of the single-pass XSLIB reader against the former line-by-line reader.
+
+    python benchmarks/read_xslib.py --path examples/pin/subxslib_pin.dat --burnups 100 --repeat 5
+
+The library is widened to 'burnups' columns by tiling its cross sections, to mimic production libraries.
+"""
+import sys
+
+from re import match
+from time import perf_counter
+from pathlib import Path
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from numpy import array, allclose, linspace, tile
+
+sys.path.append(str(Path(__file__).parent.parent))
+from codes.classes import XSLIB
+from codes.constants import MT_dict
+
+
+def legacy_read(filepath):
+    """
+    The former reader of XSLIB.__init__, returning {(nuclide name, MT): xs}.
+    """
+    with open(filepath, 'r') as fileopen:
+        filelines = fileopen.readlines()
+
+    index = 0
+    burnups = []
+    while index < len(filelines):
+        if 'BU(MWd/kgHM)' not in filelines[index]:
+            index += 1
+        else:
+            new_format = True
+            burnups = array([float(bu) for bu in filelines[index+1].split()])
+            break
+    if len(burnups) == 0:
+        new_format = False
+        burnups = array([0, 100])
+        index = 0
+
+    while 'NucId' not in filelines[index]:
+        index += 1
+    index += 1
+
+    xses = {}
+    while index < len(filelines) and filelines[index][:2] != '-1':
+        if (data:=match(r'^(\d+)\s+([A-Za-z0-9_]+)\s+(\d+)\s*\n$', filelines[index])) is not None:
+            nuc_name = data.group(2)
+            subindex = 1
+            while index+subindex < len(filelines) and (data:=match(r'^\s+([\d]+)', filelines[index+subindex])) is not None:
+                rec_name = next((name for name, MT in MT_dict.items() if MT == int(data.group(1))), None)
+                data = [float(xs) for xs in filelines[index+subindex].split()]
+                xses[(nuc_name, MT_dict[rec_name])] = array(data[1:]) if new_format else array(data[2:] * 2)
+                subindex += 1
+        index += subindex
+    return burnups, xses
+
+
+def widen(filepath, burnups, outpath):
+    """
+    Write a copy of the library with 'burnups' burnup steps.
+    """
+    xslib = XSLIB(filepath)
+    repeats = -(-burnups // len(xslib.burnups))
+    wide = XSLIB(outpath, read=False)
+    wide.burnups = linspace(0, 100, burnups)
+    for nuclide in xslib.nuclides:
+        for reaction in nuclide.reactions:
+            wide.check_nuclide(nuclide.name).check_reaction(reaction.name).xses = tile(reaction.xses, repeats)[:burnups]
+    wide.export()
+
+
+def timeit(func, repeat):
+    times = []
+    for _ in range(repeat):
+        time_start = perf_counter()
+        result = func()
+        times.append(perf_counter() - time_start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument('--path', type=str, default=str(Path(__file__).parent.parent / 'examples/pin/subxslib_pin.dat'))
+    parser.add_argument('--burnups', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as tmpdir:
+        filepath = Path(tmpdir) / 'wide.dat'
+        widen(args.path, args.burnups, filepath)
+
+        time_legacy, (burnups, xses) = timeit(lambda: legacy_read(filepath), args.repeat)
+        time_new, xslib = timeit(lambda: XSLIB(filepath), args.repeat)
+
+    assert allclose(burnups, xslib.burnups)
+    assert len(xses) == len(xslib.entry_MTs)
+    for nuclide in xslib.nuclides:
+        for reaction in nuclide.reactions:
+            assert allclose(xses[(nuclide.name, reaction.MT)], reaction.xses)
+
+    print(f"Library: {len(xslib.nuclides)} nuclides, {len(xses)} reactions, {len(burnups)} burnup steps")
+    print(f"Legacy reader     : {time_legacy*1000:>10.2f} ms")
+    print(f"Single-pass reader: {time_new*1000:>10.2f} ms")
+    print(f"Speed-up          : {time_legacy/time_new:>10.2f}x")
@@ -1,5 +1,6 @@
 from .modify_openmc_input import modify_openmc_input
 from .retrieve_openmc_results import retrieve_openmc_results
 from .get_args import get_args
+from .batch import run_batch
 
 
@@ -0,0 +1,90 @@
+#-*-coding: UTF-8 -*-
+import os
+import sys
+import json
+
+from pathlib import Path
+from subprocess import run, STDOUT
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from logging import info, basicConfig, INFO
+
+from .get_args import get_args
+
+
+LOG_NAME = 'genlib.log'
+
+
+def run_case(case, threads_per_job=None):
+    """
+    Generate the library of one case in a separate Python process, so that a crash of OpenMC
+    only fails this case. The stdout and stderr of the process, including those of OpenMC,
+    are written to 'genlib.log' in the output path of the case.
+
+    :param case: dict, arguments of the case for get_args.
+    :param threads_per_job: int, number of OpenMP threads of OpenMC, not set if None.
+
+    :return: dict of 'output_path', 'status', 'returncode', 'time' and 'error' of the case,
+        'error' being the message of an exception raised before the process could start, None otherwise.
+    """
+    time_start = time()
+    output_path = case.get('output_path')
+    try:
+        args = get_args(dict(case))
+        output_path = args.output_path
+        args.output_path.mkdir(parents=True, exist_ok=True)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([str(Path(__file__).parent.parent)] + ([env['PYTHONPATH']] if 'PYTHONPATH' in env else []))
+        if threads_per_job is not None:
+            env['OMP_NUM_THREADS'] = str(threads_per_job)
+
+        with open(args.output_path / LOG_NAME, 'w') as log:
+            returncode = run([sys.executable, '-m', 'codes.batch_case', json.dumps(case, default=str)],
+                             stdout=log, stderr=STDOUT, env=env).returncode
+    except Exception as error:
+        # 子进程启动前的错误同样只使该算例失败
+        return {'output_path': str(output_path), 'status': 'failed', 'returncode': None,
+                'time': time() - time_start, 'error': f"{type(error).__name__}: {error}"}
+    return {'output_path': str(args.output_path), 'status': 'done' if returncode == 0 else 'failed',
+            'returncode': returncode, 'time': time() - time_start, 'error': None}
+
+
+def run_batch(cases, max_parallel=1, threads_per_job=None):
+    """
+    Generate the libraries of many cases concurrently, running get_args, modify_openmc_input
+    and retrieve_openmc_results for each case in its own process.
+    A failed case is logged and reported in the summary, without stopping the others.
+
+    :param cases: list, dicts of arguments for get_args, one per case.
+    :param max_parallel: int, maximum number of cases running at the same time.
+    :param threads_per_job: int, number of OpenMP threads of OpenMC in each case.
+
+    :return: list, results of run_case in the order of the cases.
+    """
+    basicConfig(level=INFO, format="%(asctime)s %(message)s")
+
+    # 每个算例需要独立的输出目录作为工作目录
+    outputs_path = [get_args(dict(case)).output_path.resolve() for case in cases]
+    if len(set(outputs_path)) != len(outputs_path):
+        duplicates = sorted({str(path) for path in outputs_path if outputs_path.count(path) > 1})
+        raise ValueError(f"Cases share the output paths {duplicates}")
+
+    time_start = time()
+    info(f"XslibGenerator: 批量运行{len(cases)}个算例, 并行数{max_parallel}...")
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = [executor.submit(run_case, case, threads_per_job) for case in cases]
+        results = []
+        for index, future in enumerate(futures):
+            results.append(future.result())
+            info(f"XslibGenerator: 算例{index} {results[-1]['status']}: {results[-1]['output_path']}")
+            if results[-1]['error'] is not None:
+                info(f"XslibGenerator: 算例{index} 启动失败: {results[-1]['error']}")
+
+    # 输出汇总表
+    info("XslibGenerator: 批量运行汇总")
+    info(f"{'case':>6}  {'status':<8}{'time(s)':>10}  output_path")
+    for index, result in enumerate(results):
+        info(f"{index:>6}  {result['status']:<8}{result['time']:>10.2f}  {result['output_path']}")
+    info(f"XslibGenerator: 成功{sum(result['status'] == 'done' for result in results)}/{len(results)}, 运行时间: {time() - time_start:.2f}s")
+    return results
+
@@ -0,0 +1,18 @@
+#-*-coding: UTF-8 -*-
+import sys
+import json
+
+from openmc.deplete import comm
+
+from .get_args import get_args
+from .modify_openmc_input import modify_openmc_input
+from .retrieve_openmc_results import retrieve_openmc_results
+
+
+if __name__ == "__main__":
+
+    # 批量运行中单个算例的子进程入口，python -m codes.batch_case '<参数字典json>'
+    args = get_args(json.loads(sys.argv[1]))
+    modify_openmc_input(args)
+    if comm.rank == 0:
+        retrieve_openmc_results(args)
@@ -1,71 +1,408 @@
+import gzip
+import json
+
+from os import getpid
+from io import TextIOWrapper
 from re import match
 from pickle import load
 from pathlib import Path
-from numpy import array, zeros, insert
+from zipfile import ZipFile, ZIP_STORED
+from xml.etree.ElementTree import iterparse
+from functools import lru_cache
+from numpy import array, asarray, zeros, insert, argsort, searchsorted, flatnonzero, isin, cumsum, concatenate, loadtxt, lexsort, bincount, column_stack
+from numpy import divide, sqrt, zeros_like
+from numpy import savez, memmap, load as load_npz
+from numpy.lib.format import read_magic, read_array_header_1_0, read_array_header_2_0
 
 from .constants import *
 
 
+@lru_cache(maxsize=None)
+def parse_nuclide_name(nuc_name):
+    """
+    Parse the nuclide name into its symbol, mass number, isomeric state, atomic number and ID.
+    
+    :param nuc_name: str, name of the nuclide, like 'U235', 'Pu239', 'Am242_m1' etc.
+    """
+    if (results := match(r'^([a-zA-Z]+)(\d+)_?(m[123])?$', nuc_name)) is None:
+        raise ValueError(f"Invalid nuclide name: {nuc_name}")
+    info = results.groups()
+    symbol = info[0]
+    mass = int(info[1])
+    state = 0 if info[2] is None else int(info[2][1])
+    atomic = Atomic_dict[symbol]
+    return symbol, mass, state, atomic, atomic * 10000 + mass * 10 + state
+
+
+def resize_rows(data, capacity):
+    """
+    Return a copy of the array with its first axis resized to 'capacity', keeping the existing rows.
+    
+    :param data: array, the array to resize.
+    :param capacity: int, new length of the first axis.
+    """
+    resized = zeros((capacity,) + data.shape[1:], dtype=data.dtype)
+    resized[:min(capacity, len(data))] = data[:capacity]
+    return resized
+
+
+def open_library(filepath, mode='r'):
+    """
+    Open a cross section library file, transparently compressing or decompressing '.gz' (gzip) and '.zst' (zstd) files.
+    Text modes use latin-1 encoding, so that one character is one byte of the file.
+    
+    :param filepath: str, path to the cross section library file.
+    :param mode: str, 'r', 'w', 'rb' or 'wb'.
+    """
+    suffix = Path(filepath).suffix
+    binary_mode = mode if 'b' in mode else mode + 'b'
+    if suffix == '.gz':
+        fileopen = gzip.open(filepath, binary_mode)
+    elif suffix == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Package zstandard is required for the zstd-compressed library {filepath}")
+        if 'r' in mode:
+            fileopen = zstandard.ZstdDecompressor().stream_reader(open(filepath, binary_mode), closefd=True)
+        else:
+            fileopen = zstandard.ZstdCompressor().stream_writer(open(filepath, binary_mode), closefd=True)
+    else:
+        return open(filepath, mode, encoding=None if 'b' in mode else 'latin-1')
+    return fileopen if 'b' in mode else TextIOWrapper(fileopen, encoding='latin-1')
+
+
+COMPRESSED_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def check_compression(compression):
+    """
+    Raise ValueError when 'compression' is not supported.
+    
+    :param compression: str, optional, 'gzip' or 'zstd', None for no compression.
+    """
+    if compression is not None and compression not in COMPRESSED_SUFFIXES:
+        raise ValueError(f"Invalid compression: {compression}, available: {list(COMPRESSED_SUFFIXES)}")
+
+
+def compressed_path(filepath, compression):
+    """
+    Path of a cross section library file compressed by 'compression', whose suffix is appended when missing.
+    
+    :param filepath: str, path to the cross section library file.
+    :param compression: str, optional, 'gzip' or 'zstd', None for no compression.
+    """
+    if compression is None:
+        return filepath
+    check_compression(compression)
+    suffix = COMPRESSED_SUFFIXES[compression]
+    return filepath if Path(filepath).suffix == suffix else Path(str(filepath) + suffix)
+
+
+def binary_path(filepath):
+    """
+    Path of the binary sidecar written next to a cross section library file, like 'xslib.dat.npz'.
+    
+    :param filepath: str, path to the cross section library file.
+    """
+    return Path(str(filepath) + '.npz')
+
+
+def metadata_path(filepath):
+    """
+    Path of the metadata written next to a cross section library file, like 'xslib.dat.json'.
+    
+    :param filepath: str, path to the cross section library file.
+    """
+    return Path(str(filepath) + '.json')
+
+
+def npz_memmap(filepath, key, mode='c'):
+    """
+    Memory-map an array stored uncompressed in a NPZ file, without reading it into memory.
+    
+    :param filepath: str, path to the NPZ file.
+    :param key: str, name of the array in the NPZ file.
+    :param mode: str, mode of numpy.memmap, 'c' (copy-on-write) by default so the file is never modified.
+    """
+    with ZipFile(filepath) as zipopen:
+        zipinfo = zipopen.getinfo(key + '.npy')
+    if zipinfo.compress_type != ZIP_STORED:
+        raise ValueError(f"Array {key} in {filepath} is compressed and cannot be memory-mapped")
+    with open(filepath, 'rb') as fileopen:
+        # skip the local file header of the zip member, then the header of the npy file
+        fileopen.seek(zipinfo.header_offset + 26)
+        name_length = int.from_bytes(fileopen.read(2), 'little')
+        extra_length = int.from_bytes(fileopen.read(2), 'little')
+        fileopen.seek(name_length + extra_length, 1)
+        version = read_magic(fileopen)
+        read_header = read_array_header_1_0 if version == (1, 0) else read_array_header_2_0
+        shape, fortran_order, dtype = read_header(fileopen)
+        offset = fileopen.tell()
+    if 0 in shape:
+        return zeros(shape, dtype=dtype)
+    return memmap(filepath, dtype=dtype, mode=mode, shape=shape, order='F' if fortran_order else 'C', offset=offset)
+
+
+def index_path(filepath):
+    """
+    Path of the byte-offset index written next to a cross section library file, like 'xslib.dat.idx'.
+    
+    :param filepath: str, path to the cross section library file.
+    """
+    return Path(str(filepath) + '.idx')
+
+
+def load_index(filepath):
+    """
+    Load the byte-offset index of a cross section library file.
+    Return None when the index does not exist, cannot be read or parsed, or is stale because the size or mtime of the file changed.
+    
+    :param filepath: str, path to the cross section library file.
+    """
+    path = index_path(filepath)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r') as fileopen:
+            index = json.load(fileopen)
+    except (ValueError, OSError):
+        return None
+    stat = Path(filepath).stat()
+    if index['size'] != stat.st_size or index['mtime'] != stat.st_mtime_ns:
+        return None
+    return index
+
+
+def write_index(filepath, lines, start, end):
+    """
+    Write the byte-offset index of a cross section library file, mapping each nuclide block to its offset and length.
+    The index is written to a temporary file and renamed, so that readers never see a partial index.
+    Failures of writing, like a read-only folder, are ignored since the index is only an accelerator.
+    
+    :param filepath: str, path to the cross section library file.
+    :param lines: list, lines of the file decoded by latin-1, so that one character is one byte.
+    :param start: int, index of the first line of the xs table.
+    :param end: int, index of the line after the xs table.
+    """
+    offsets = cumsum([0] + [len(line) for line in lines])
+    rows = [i for i in range(start, end) if lines[i][:1].isdigit()] + [end]
+    stat = Path(filepath).stat()
+    index = {'size': stat.st_size,
+             'mtime': stat.st_mtime_ns,
+             'table': int(offsets[start]),
+             'nuclides': {lines[row].split()[1]: [int(offsets[row]), int(offsets[next_row] - offsets[row])] for row, next_row in zip(rows[:-1], rows[1:])}}
+    temp_path = index_path(filepath).with_suffix(f'.{getpid()}.idx')
+    try:
+        with open(temp_path, 'w') as fileopen:
+            json.dump(index, fileopen)
+        temp_path.replace(index_path(filepath))
+    except OSError:
+        temp_path.unlink(missing_ok=True)
+    return index
+
+
+def read_header(lines):
+    """
+    Read the header of a cross section library file.
+    Libraries of old format have no burnup table and only one xs column, their burnups are [0, 100].
+    
+    :param lines: list, lines of the file, at least until the 'NucId' line.
+    
+    :return: whether the library is of new format, the burnups, and the index of the first line of the xs table.
+    """
+    index = next((i for i, line in enumerate(lines) if 'BU(MWd/kgHM)' in line), None)
+    new_format = index is not None
+    burnups = array(lines[index+1].split(), dtype=float) if new_format else array([0, 100])
+    index = next(i for i, line in enumerate(lines) if 'NucId' in line) + 1
+    return new_format, burnups, index
+
+
+def parse_table(table, new_format, filepath=None):
+    """
+    Parse lines of the xs table in one pass.
+    The lines are classified once and all numbers of the reaction lines are converted by numpy in bulk.
+    
+    :param table: list, lines of the xs table.
+    :param new_format: bool, whether the library is of new format.
+    :param filepath: str, optional, path to the file for error messages.
+    
+    :return: nuclide names, and nuclide IDs, MT numbers and cross sections of the entries.
+    """
+    # classify lines: nuclide lines start with the nuclide ID, reaction lines are indented
+    is_nuc = array([line[:1].isdigit() for line in table], dtype=bool)
+    is_rec = array([line[:1].isspace() and not line.isspace() for line in table], dtype=bool)
+    owners = cumsum(is_nuc) - 1
+    is_rec &= owners >= 0
+    nuc_names = [table[i].split()[1] for i in flatnonzero(is_nuc)]
+    nuc_ids = array([parse_nuclide_name(nuc_name)[4] for nuc_name in nuc_names], dtype=int)
+
+    # convert all numbers of the reaction lines at once
+    rec_lines = [table[i] for i in flatnonzero(is_rec)]
+    if len(rec_lines) == 0:
+        return nuc_names, zeros(0, dtype=int), zeros(0, dtype=int), zeros((0, 0))
+    values = loadtxt(rec_lines, ndmin=2)
+    MTs = values[:, 0].astype(int)
+    if (invalid := set(MTs.tolist()) - MT_names.keys()):
+        raise ValueError(f"Invalid MT numbers in {filepath}: {sorted(invalid)}")
+    xses = values[:, 1:] if new_format else concatenate([values[:, 2:], values[:, 2:]], axis=1)
+    return nuc_names, nuc_ids[owners[is_rec]], MTs, xses
+
+
+def read_burnups(filepath):
+    """
+    Read only the burnups of a cross section library file, stopping at the header of the xs table.
+    
+    :param filepath: str, path to the cross section library file.
+    """
+    header = []
+    with open_library(filepath, 'r') as fileopen:
+        for line in fileopen:
+            header.append(line)
+            if 'NucId' in line:
+                break
+    return read_header(header)[1]
+
+
+def iter_nuclides(filepath):
+    """
+    Lazily iterate over the nuclide blocks of a cross section library file.
+    Only one block is kept in memory at a time, and no XSLIB is built, so that many libraries can be streamed.
+    The burnups of the library can be read with read_burnups.
+    
+    :param filepath: str, path to the cross section library file.
+    
+    :return: generator of (nuclide name, {reaction name: xs array}).
+    """
+    def parse_block(block):
+        nuc_names, _, MTs, xses = parse_table(block, new_format, filepath)
+        return nuc_names[0], {MT_names[MT]: xs for MT, xs in zip(MTs.tolist(), xses)}
+
+    with open_library(filepath, 'r') as fileopen:
+        header = []
+        for line in fileopen:
+            header.append(line)
+            if 'NucId' in line:
+                break
+        new_format = read_header(header)[0]
+
+        block = None
+        for line in fileopen:
+            if line[:2] == '-1':
+                break
+            if line[:1].isdigit():
+                if block is not None:
+                    yield parse_block(block)
+                block = [line]
+            elif block is not None:
+                block.append(line)
+        if block is not None:
+            yield parse_block(block)
+
+
 class Reaction():
     """
     Class representing a nuclear reaction.
+    It is a thin view over one entry of the columnar arrays of the cross section library,
+    located by the (nuclide ID, MT) key in the hash index of the library.
     """
-    def __init__(self, rec_name, rate=None, xs=None):
+    def __init__(self, nuclide, rec_name):
         """
-        Initialize the reaction.
+        Initialize the reaction view.
 
+        :param nuclide: Nuclide, the nuclide view this reaction belongs to.
         :param rec_name: str, name of the reaction, like '(n,gamma)', '(n,2n)', '(n,f)'etc.
-        :param rate: array, optional, reaction rate of the reaction.
-        :param xs: array, optional, cross section of the reaction.
         """
+        self.nuclide = nuclide
         self.name = rec_name
         self.MT = MT_dict[rec_name]
-        self.rate = rate if rate is not None else []
-        self.xs = xs if xs is not None else []
+
+    @property
+    def row(self):
+        return self.nuclide.xslib._entry_index[(self.nuclide.id, self.MT)]
+
+    @property
+    def rate(self):
+        return self.nuclide.xslib._rate[self.row]
+
+    @rate.setter
+    def rate(self, rate):
+        self.nuclide.xslib._set_row('_rate', self.row, rate)
+
+    @property
+    def xses(self):
+        return self.nuclide.xslib._xs[self.row]
+
+    @xses.setter
+    def xses(self, xses):
+        self.nuclide.xslib._set_row('_xs', self.row, xses)
+
+    xs = xses
+
+    @property
+    def rate_std(self):
+        return self.nuclide.xslib._rate_std[self.row]
+
+    @rate_std.setter
+    def rate_std(self, rate_std):
+        self.nuclide.xslib._set_row('_rate_std', self.row, rate_std)
+
+    @property
+    def xs_std(self):
+        return self.nuclide.xslib._xs_std[self.row]
 
 
 class Nuclide():
     """
     Class representing a nuclide.
+    It is a thin view over one row of the nuclide table of the cross section library,
+    its reactions are the library entries sharing its nuclide ID.
     """
-    def __init__(self, nuc_name, den=None):
+    def __init__(self, xslib, nuc_name):
         """
-        Initialize the nuclide.
+        Initialize the nuclide view.
         
+        :param xslib: XSLIB, the cross section library storing the data.
         :param nuc_name: str, name of the nuclide, like 'U235', 'Pu239', 'Xe135' etc.
-        :param den: float, optional, density of the nuclide.
         """
+        self.xslib = xslib
         self.name = nuc_name
-        self.reactions = []
-        self.den = den
-        
-        if (results := match(r'^([a-zA-Z]+)(\d+)_?(m[123])?$', self.name)) is None:
-            raise ValueError(f"Invalid nuclide name: {self.name}")
-        else:
-            info = results.groups()
-            self.symbol = info[0]
-            self.mass = int(info[1])
-            self.state = 0 if info[2] is None else int(info[2][1])
-            self.atomic = Atomic_dict[self.symbol]
-            self.id = self.atomic * 10000 + self.mass * 10 + self.state
+        self.symbol, self.mass, self.state, self.atomic, self.id = parse_nuclide_name(nuc_name)
+
+    @property
+    def row(self):
+        return self.xslib._nuc_index[self.name]
+
+    @property
+    def den(self):
+        return self.xslib._den[self.row]
+
+    @den.setter
+    def den(self, den):
+        self.xslib._set_row('_den', self.row, den)
+
+    @property
+    def reactions(self):
+        xslib = self.xslib
+        rows = flatnonzero(xslib._entry_nuc_id[:xslib._n_entries] == self.id)
+        return [Reaction(self, MT_names[MT]) for MT in xslib._entry_MT[rows]]
 
     def check_reaction(self, rec_name, initiate=True):
         """
-        Find the reaction in the reactions list using the reaction name.
-        If the reaction exists in the list, return the reaction directly.
+        Find the reaction of the nuclide using the reaction name.
+        If the reaction exists in the library, return the reaction directly.
         Otherwise, and when 'initiate' is True, create a new reaction and return it.
         When there is no such reaction and 'initiate' is False, raise an error instead.
         
         :param rec_name: str, name of the reaction, like '(n,gamma)', '(n,2n)', '(n,f)'etc.
         :param initiate: bool, whether to create a new reaction if the reaction does not exist.
         """
-        if (reaction:=next((reaction for reaction in self.reactions if reaction.name == rec_name), None)) is None:
+        if (self.id, MT_dict[rec_name]) not in self.xslib._entry_index:
             if initiate:
-                self.reactions.append(Reaction(rec_name))
-                reaction = self.reactions[-1]
+                self.xslib._add_entry(self.id, MT_dict[rec_name])
             else:
                 raise ValueError(f"Reaction {rec_name} not found")
-        return reaction
+        return Reaction(self, rec_name)
 
     # def __getitem__(self, rec_name):
     #     if isinstance(rec_name, int):
@@ -74,9 +411,11 @@ class Nuclide():
 
     def sort_reactions(self):
         """
-        Sort the reactions list by the reaction MT number.
+        Sort the reactions of the nuclide by the reaction MT number.
         """
-        self.reactions.sort(key=lambda reaction: reaction.MT)
+        xslib = self.xslib
+        rows = flatnonzero(xslib._entry_nuc_id[:xslib._n_entries] == self.id)
+        xslib._reorder_entries(rows, rows[argsort(xslib._entry_MT[rows], kind='stable')])
 
 
 class ISOMERICS():
@@ -94,6 +433,10 @@ class ISOMERICS():
         self.path = path
         with open(path, 'rb') as fileopen:
             self.isomerics = load(fileopen)
+        # compile the records into a (nuclide name, MT) index, the first record wins as in a linear search
+        self.index = {}
+        for isomeric in self.isomerics:
+            self.index.setdefault((isomeric['name'], isomeric['MT']), isomeric['fracm'])
 
     def __call__(self, nuc_name, rec_name):
         """
@@ -102,18 +445,140 @@ class ISOMERICS():
         :param nuc_name: str, name of the nuclide, like 'U235', 'Pu239', 'Xe135' etc.
         :param rec_name: str, name of the reaction, like '(n,gamma)', '(n,2n)', '(n,f)'etc.
         """
-        isomeric = next((isomeric for isomeric in self.isomerics if (isomeric['MT'] == MT_dict[rec_name]) and (isomeric['name'] == nuc_name)), None)
-        return isomeric['fracm'] if isomeric else 0
+        return self.index.get((nuc_name, MT_dict[rec_name]), 0)
+
+
+class GEOMETRY():
+    """
+    Class representing the cell, universe, lattice and material indexes of an OpenMC model.
+    geometry.xml and materials.xml are streamed once and only the element attributes are kept,
+    so that the materials filling a cell are resolved through any depth of universe and lattice nesting
+    in time linear to the model size.
+    """
+    def __init__(self, geometry_path, materials_path):
+        """
+        Initialize the geometry object.
+
+        :param geometry_path: str, path to geometry.xml.
+        :param materials_path: str, path to materials.xml.
+        """
+        self.cells = {}       # 栅元id: 属性
+        self.universes = {}   # 空间id: 栅元id列表
+        self.lattices = {}    # 栅格id: 空间id集合
+        self.materials = {}   # 材料id: 属性
+        self._memo = {}
+        for _, element in iterparse(str(geometry_path)):
+            if element.tag == 'cell':
+                self.cells[element.get('id')] = dict(element.attrib)
+                self.universes.setdefault(element.get('universe', '0'), []).append(element.get('id'))
+            elif element.tag in ('lattice', 'hex_lattice'):
+                universes = set(element.findtext('universes', '').split())
+                if (outer := element.get('outer', element.findtext('outer'))) is not None:
+                    universes.add(outer.strip())
+                self.lattices[element.get('id')] = universes
+            if element.tag in ('cell', 'lattice', 'hex_lattice', 'surface'):
+                element.clear()
+        for _, element in iterparse(str(materials_path)):
+            if element.tag == 'material':
+                self.materials[element.get('id')] = dict(element.attrib)
+                element.clear()
+
+    def select_materials(self, index, values):
+        """
+        Select the materials whose attribute 'index' is in 'values'.
+
+        :param index: str, attribute of the materials, like 'id' or 'name'.
+        :param values: list, values of the attribute.
+
+        :return: list, ids of the materials.
+        """
+        return [material_id for material_id, attrib in self.materials.items() if attrib.get(index) in values]
+
+    def select_cells(self, index, values):
+        """
+        Select the cells whose attribute 'index' is in 'values'.
+
+        :param index: str, attribute of the cells, like 'id' or 'name'.
+        :param values: list, values of the attribute.
+
+        :return: list, ids of the cells.
+        """
+        return [cell_id for cell_id, attrib in self.cells.items() if attrib.get(index) in values]
+
+    def cell_materials(self, cell_id):
+        """
+        Resolve the materials in a cell, descending its fill recursively.
+
+        :param cell_id: str, id of the cell.
+
+        :return: set, ids of the materials.
+        """
+        attrib = self.cells[cell_id]
+        if attrib.get('fill') is None:
+            return {material_id for material_id in attrib.get('material', '').split() if material_id != 'void'}
+        return self.fill_materials(attrib['fill'])
+
+    def fill_materials(self, fill_id):
+        """
+        Resolve the materials in a universe or a lattice, memoized since filled universes are shared by many cells.
+
+        :param fill_id: str, id of the universe or lattice.
+
+        :return: set, ids of the materials.
+        """
+        if fill_id not in self._memo:
+            if fill_id in self.lattices:
+                materials_id = set().union(*[self.fill_materials(universe_id) for universe_id in self.lattices[fill_id]])
+            elif fill_id in self.universes:
+                materials_id = set().union(*[self.cell_materials(cell_id) for cell_id in self.universes[fill_id]])
+            else:
+                raise ValueError(f"Universe or lattice {fill_id} not found in geometry")
+            self._memo[fill_id] = materials_id
+        return self._memo[fill_id]
+
+    def burn_materials(self, materials_index, materials, cells_index, cells):
+        """
+        Resolve the burnable materials, selected directly or filling the burnable cells.
+
+        :param materials_index: str, attribute to select the materials.
+        :param materials: list, values of the attribute of the burnable materials.
+        :param cells_index: str, attribute to select the cells.
+        :param cells: list, values of the attribute of the burnable cells.
+
+        :return: list, ids of the burnable materials, sorted.
+        """
+        materials_id = set(self.select_materials(materials_index, materials))
+        for cell_id in self.select_cells(cells_index, cells):
+            materials_id |= self.cell_materials(cell_id)
+        return sorted(materials_id, key=int)
+
+    def volume(self, materials_id):
+        """
+        Sum the volumes of the materials.
+
+        :param materials_id: list, ids of the materials.
+
+        :return: float, total volume.
+        """
+        if (missing := [material_id for material_id in materials_id if 'volume' not in self.materials[material_id]]):
+            raise ValueError(f"Volumes of materials {missing} not set")
+        return sum(float(self.materials[material_id]['volume']) for material_id in materials_id)
 
 
 class XSLIB():
     """
-    Class representing the cross section library in a hierarchical structure.
-    It stores the nuclides in a list, and nuclides store their own reactions in other smaller lists.
+    Class representing the cross section library in a columnar structure.
+    All entries (nuclide, reaction) share dense (n_entries, n_burnups) arrays of cross sections and reaction rates,
+    with integer nuclide ID and MT columns and a hash index on (nuclide ID, MT).
+    Nuclide densities are stored in a dense (n_nuclides, n_burnups) array of the nuclide table.
+    The Nuclide and Reaction classes are thin views over these arrays.
     
     This class is compatible with libraries of both old and new formats when reading existing files.
     But it only exports into the new format.
     """
+    # dense (n_entries, n_burnups) arrays of the entry table
+    _matrices = ['_xs', '_rate', '_xs_std', '_rate_std']
+
     def __init__(self, filepath='testlib.dat', burnups=None, nuclides=None, read=True):
         """
         Initialize the cross section library.
@@ -121,70 +586,326 @@ class XSLIB():
         
         :param filepath: str, path to the cross section library file.
         :param burnups: list, optional, burnup steps of the cross section library.
-        :param nuclides: list, optional, nuclides in the cross section library.
+        :param nuclides: list, optional, names of the nuclides in the cross section library.
         :param read: bool, whether to read the file if the file exists.
         """
         self.filepath = filepath
         self.burnups = burnups if burnups is not None else []
-        self.nuclides = nuclides if nuclides is not None else []
+        self.flux_std = None
+        # generation settings of the library, like the normalization mode
+        self.metadata = {}
+
+        # nuclide table
+        self._nuc_index = {}
+        self._nuc_names = []
+        self._nuc_ids = zeros(0, dtype=int)
+        self._den = zeros((0, 0))
+        # entry table
+        self._entry_index = {}
+        self._entry_nuc_id = zeros(0, dtype=int)
+        self._entry_MT = zeros(0, dtype=int)
+        for name in self._matrices:
+            setattr(self, name, zeros((0, 0)))
+        self._n_entries = 0
+        self._width = None
+
+        for nuc_name in (nuclides if nuclides is not None else []):
+            self.check_nuclide(nuc_name)
 
         if Path(filepath).exists() and read:
-            with open(self.filepath, 'r') as fileopen:
-                self.filelines = fileopen.readlines()
-
-            # read burnup table
-            index = 0
-            while index < len(self.filelines):
-                # count index until the burnup table
-                if 'BU(MWd/kgHM)' not in self.filelines[index]:
-                    index += 1
-                else:
-                    new_format = True
-                    self.burnups = array([float(bu) for bu in self.filelines[index+1].split()])
-                    break
-            if self.burnups == []:
-                new_format = False
-                self.burnups = array([0, 100])
-                index = 0
-
-            # count index until the xs table
-            while 'NucId' not in self.filelines[index]:
-                index += 1
-            index += 1
-
-            # read xs table
-            while index < len(self.filelines) and self.filelines[index][:2] != '-1':
-                if (data:=match(r'^(\d+)\s+([A-Za-z0-9_]+)\s+(\d+)\s*\n$', self.filelines[index])) is not None:
-                    nuclide = self.check_nuclide(data.group(2))
-                    subindex = 1
-                    while index+subindex < len(self.filelines) and (data:=match(r'^\s+([\d]+)', self.filelines[index+subindex])) is not None:
-                        rec_name = next((name for name, MT in MT_dict.items() if MT == int(data.group(1))), None)
-                        reaction = nuclide.check_reaction(rec_name)
-                        data = [float(xs) for xs in self.filelines[index+subindex].split()]
-                        if new_format:
-                            reaction.xses = array(data[1:])
-                        else:
-                            reaction.xses = array(data[2:] * 2)
-                        subindex += 1
-                index += subindex
+            self.read()
+
+    def read(self, filepath=None, binary=True):
+        """
+        Read a cross section library file in one pass, and build its byte-offset index when missing or stale.
+        When 'binary' is True and an up-to-date binary sidecar exists, it is loaded instead of the text.
+        
+        :param filepath: str, optional, path to the cross section library file.
+        :param binary: bool, whether to prefer the binary sidecar of the file.
+        """
+        if filepath is None:
+            filepath = self.filepath
+        if metadata_path(filepath).exists():
+            with open(metadata_path(filepath), 'r') as fileopen:
+                self.metadata = json.load(fileopen)
+        if binary and binary_path(filepath).exists() and binary_path(filepath).stat().st_mtime >= Path(filepath).stat().st_mtime:
+            return self.read_binary(filepath)
+        with open_library(filepath, 'rb') as fileopen:
+            lines = fileopen.read().decode('latin-1').splitlines(keepends=True)
+
+        new_format, self.burnups, index = read_header(lines)
+        end = next((i for i in range(index, len(lines)) if lines[i][:2] == '-1'), len(lines))
+        nuc_names, nuc_ids, MTs, xses = parse_table(lines[index:end], new_format, filepath)
+        for nuc_name in nuc_names:
+            self.check_nuclide(nuc_name)
+        if len(MTs) != 0:
+            self._add_entries(nuc_ids, MTs, xses)
+
+        if Path(filepath).suffix not in COMPRESSED_SUFFIXES.values() and load_index(filepath) is None:
+            write_index(filepath, lines, index, end)
+
+    def read_nuclides(self, nuc_names, filepath=None):
+        """
+        Read only the blocks of the given nuclides from a cross section library file.
+        The blocks are located by the byte-offset index of the file, which is built when missing or stale.
+        When an up-to-date binary sidecar exists, the nuclides are read from it instead.
+        
+        :param nuc_names: list, names of the nuclides, like ['U235', 'Pu239', 'Xe135'].
+        :param filepath: str, optional, path to the cross section library file.
+        """
+        if filepath is None:
+            filepath = self.filepath
+        if binary_path(filepath).exists() and binary_path(filepath).stat().st_mtime >= Path(filepath).stat().st_mtime:
+            return self.read_binary(filepath, nuclides=nuc_names)
+        if Path(filepath).suffix in COMPRESSED_SUFFIXES.values():
+            # compressed files cannot be seeked, so their blocks are streamed instead
+            blocks = {nuc_name: reactions for nuc_name, reactions in iter_nuclides(filepath) if nuc_name in set(nuc_names)}
+            if (missing := [nuc_name for nuc_name in nuc_names if nuc_name not in blocks]):
+                raise ValueError(f"Nuclides {missing} not found in {filepath}")
+            self.burnups = read_burnups(filepath)
+            for nuc_name in nuc_names:
+                nuclide = self.check_nuclide(nuc_name)
+                for rec_name, xs in blocks[nuc_name].items():
+                    nuclide.check_reaction(rec_name).xses = xs
+            return
+        if (index := load_index(filepath)) is None:
+            with open(filepath, 'rb') as fileopen:
+                lines = fileopen.read().decode('latin-1').splitlines(keepends=True)
+            _, _, start = read_header(lines)
+            end = next((i for i in range(start, len(lines)) if lines[i][:2] == '-1'), len(lines))
+            index = write_index(filepath, lines, start, end)
+        if (missing := [nuc_name for nuc_name in nuc_names if nuc_name not in index['nuclides']]):
+            raise ValueError(f"Nuclides {missing} not found in {filepath}")
+
+        blocks = []
+        with open(filepath, 'rb') as fileopen:
+            header = fileopen.read(index['table']).decode('latin-1').splitlines(keepends=True)
+            for nuc_name in nuc_names:
+                offset, length = index['nuclides'][nuc_name]
+                fileopen.seek(offset)
+                blocks.append(fileopen.read(length).decode('latin-1'))
+        new_format, self.burnups, _ = read_header(header)
+        nuc_names, nuc_ids, MTs, xses = parse_table(''.join(blocks).splitlines(keepends=True), new_format, filepath)
+        for nuc_name in nuc_names:
+            self.check_nuclide(nuc_name)
+        if len(MTs) != 0:
+            self._add_entries(nuc_ids, MTs, xses)
+
+    def read_binary(self, filepath=None, nuclides=None):
+        """
+        Read the binary sidecar of a cross section library file.
+        The xs matrix is memory-mapped, so only the pages of the selected nuclides are read from disk.
+        
+        :param filepath: str, optional, path to the cross section library file, not the sidecar.
+        :param nuclides: list, optional, names of the nuclides to read, all nuclides by default.
+        """
+        if filepath is None:
+            filepath = self.filepath
+        path = binary_path(filepath)
+        with load_npz(path) as npz:
+            self.burnups = npz['burnups']
+            nuc_names = npz['nuc_names'].tolist()
+            nuc_ids = npz['entry_nuc_ids']
+            MTs = npz['entry_MTs']
+        xses = npz_memmap(path, 'xs')
+        if nuclides is not None:
+            if (missing := [nuc_name for nuc_name in nuclides if nuc_name not in set(nuc_names)]):
+                raise ValueError(f"Nuclides {missing} not found in {path}")
+            # order the nuclides as requested like the text path, keeping the file order of reactions inside each nuclide
+            nuc_names = list(dict.fromkeys(nuclides))
+            order = {parse_nuclide_name(nuc_name)[4]: index for index, nuc_name in enumerate(nuc_names)}
+            rows = flatnonzero(isin(nuc_ids, list(order)))
+            rows = rows[argsort([order[nuc_id] for nuc_id in nuc_ids[rows].tolist()], kind='stable')]
+            nuc_ids, MTs, xses = nuc_ids[rows], MTs[rows], xses[rows]
+
+        for nuc_name in nuc_names:
+            self.check_nuclide(nuc_name)
+        if self._n_entries != 0:
+            self._add_entries(nuc_ids, MTs, xses)
+            return
+        self._set_width(xses.shape[1])
+        self._entry_nuc_id = nuc_ids
+        self._entry_MT = MTs
+        for name in self._matrices:
+            setattr(self, name, zeros(xses.shape))
+        self._xs = xses
+        self._n_entries = len(MTs)
+        self._entry_index = dict(zip(zip(nuc_ids.tolist(), MTs.tolist()), range(len(MTs))))
+
+    @property
+    def nuclides(self):
+        """
+        Views of the nuclides in the order of the nuclide table.
+        """
+        return [Nuclide(self, nuc_name) for nuc_name in self._nuc_names]
+
+    @property
+    def entry_nuc_ids(self):
+        return self._entry_nuc_id[:self._n_entries]
+
+    @property
+    def entry_MTs(self):
+        return self._entry_MT[:self._n_entries]
+
+    @property
+    def xs_matrix(self):
+        return self._xs[:self._n_entries]
+
+    @property
+    def rate_matrix(self):
+        return self._rate[:self._n_entries]
+
+    @property
+    def xs_std_matrix(self):
+        return self._xs_std[:self._n_entries]
+
+    @property
+    def rate_std_matrix(self):
+        return self._rate_std[:self._n_entries]
+
+    @property
+    def den_matrix(self):
+        return self._den[:len(self._nuc_names)]
+
+    def _set_width(self, width):
+        """
+        Fix the number of burnup columns of the dense arrays, which is decided by the first assigned array.
+        
+        :param width: int, number of burnup columns.
+        """
+        if self._width is None:
+            self._width = width
+            for name in ['_den'] + self._matrices:
+                setattr(self, name, zeros((len(getattr(self, name)), width)))
+        elif self._width != width:
+            raise ValueError(f"Data of {width} burnup steps does not match the library of {self._width} burnup steps")
+
+    def _set_row(self, name, row, value):
+        """
+        Assign a row of one of the dense arrays, scalars are broadcast to all burnup steps.
+        
+        :param name: str, attribute name of the dense array, '_den' or one of the entry matrices.
+        :param row: int, row index in the dense array.
+        :param value: array or float, data to assign.
+        """
+        value = asarray(value, dtype=float)
+        if self._width is None:
+            self._set_width(value.size if value.ndim > 0 else len(self.burnups))
+        getattr(self, name)[row] = value
+
+    def _add_entry(self, nuc_id, MT):
+        """
+        Append a new (nuclide, reaction) entry, growing the arrays geometrically when they are full.
+        
+        :param nuc_id: int, ID of the nuclide.
+        :param MT: int, MT number of the reaction.
+        """
+        if self._n_entries == len(self._entry_MT):
+            capacity = max(16, 2 * self._n_entries)
+            for name in ['_entry_nuc_id', '_entry_MT'] + self._matrices:
+                setattr(self, name, resize_rows(getattr(self, name), capacity))
+        self._entry_nuc_id[self._n_entries] = nuc_id
+        self._entry_MT[self._n_entries] = MT
+        self._entry_index[(nuc_id, MT)] = self._n_entries
+        self._n_entries += 1
+
+    def _add_entries(self, nuc_ids, MTs, xses, name='_xs'):
+        """
+        Assign the cross sections of many entries at once, appending the entries that do not exist yet.
+        
+        :param nuc_ids: array, IDs of the nuclides.
+        :param MTs: array, MT numbers of the reactions.
+        :param xses: array, cross sections of shape (n_entries, n_burnups).
+        :param name: str, attribute name of the entry matrix to assign, the cross sections by default.
+        """
+        self._set_width(xses.shape[1])
+        keys = list(zip(nuc_ids.tolist(), MTs.tolist()))
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._entry_index]
+        n_entries = self._n_entries + len(new_keys)
+        if n_entries > len(self._entry_MT):
+            capacity = max(16, n_entries)
+            for column in ['_entry_nuc_id', '_entry_MT'] + self._matrices:
+                setattr(self, column, resize_rows(getattr(self, column), capacity))
+        if len(new_keys) != 0:
+            self._entry_nuc_id[self._n_entries:n_entries], self._entry_MT[self._n_entries:n_entries] = array(new_keys).T
+        self._entry_index.update(zip(new_keys, range(self._n_entries, n_entries)))
+        self._n_entries = n_entries
+        getattr(self, name)[[self._entry_index[key] for key in keys]] = xses
+
+    def _reorder_entries(self, rows, new_rows):
+        """
+        Move the entries in 'new_rows' into the positions 'rows' and refresh the hash index.
+        
+        :param rows: array, target row indices.
+        :param new_rows: array, source row indices.
+        """
+        for name in ['_entry_nuc_id', '_entry_MT'] + self._matrices:
+            getattr(self, name)[rows] = getattr(self, name)[new_rows]
+        for row in rows:
+            self._entry_index[(int(self._entry_nuc_id[row]), int(self._entry_MT[row]))] = int(row)
+
+    def _select_entries(self, mask):
+        """
+        Keep only the entries selected by the boolean mask and rebuild the hash index.
+        
+        :param mask: array, boolean mask over the entries.
+        """
+        n_entries = self._n_entries
+        for name in ['_entry_nuc_id', '_entry_MT'] + self._matrices:
+            setattr(self, name, getattr(self, name)[:n_entries][mask])
+        self._n_entries = len(self._entry_MT)
+        self._entry_index = {key: row for row, key in enumerate(zip(self._entry_nuc_id.tolist(), self._entry_MT.tolist()))}
+
+    def _select_nuclides(self, rows):
+        """
+        Keep only the nuclides in 'rows' in the given order and rebuild the nuclide index.
+        
+        :param rows: array, row indices of the nuclide table.
+        """
+        n_nuclides = len(self._nuc_names)
+        self._nuc_names = [self._nuc_names[row] for row in rows]
+        self._nuc_ids = self._nuc_ids[:n_nuclides][rows]
+        self._den = self._den[:n_nuclides][rows]
+        self._nuc_index = {nuc_name: row for row, nuc_name in enumerate(self._nuc_names)}
+
+    def _entry_nuc_rows(self):
+        """
+        Rows of the nuclide table for every entry, found through the sorted nuclide IDs.
+        """
+        nuc_ids = self._nuc_ids[:len(self._nuc_names)]
+        order = argsort(nuc_ids)
+        return order[searchsorted(nuc_ids, self.entry_nuc_ids, sorter=order)]
+
+    def _export_order(self):
+        """
+        Rows of the entries in the export order: by the nuclide table, then by the MT number.
+        """
+        return lexsort((self.entry_MTs, self._entry_nuc_rows()))
 
     def check_nuclide(self, nuc_name, initiate=True) -> Nuclide:
         """
-        Find the nuclide in the nuclides list using the nuclide name.
-        If the nuclide exists in the list, return the nuclide directly.
+        Find the nuclide in the nuclide table using the nuclide name.
+        If the nuclide exists in the table, return the nuclide directly.
         Otherwise, and when 'initiate' is True, create a new nuclide and return it.
         When there is no such nuclide and 'initiate' is False, raise an error instead.
         
         :param nuc_name: str, name of the nuclide, like 'U235', 'Pu239', 'Xe135' etc.
         :param initiate: bool, whether to create a new nuclide if the nuclide does not exist.
         """
-        if (nuclide:=next((nuclide for nuclide in self.nuclides if nuclide.name == nuc_name), None)) is None:
+        if nuc_name not in self._nuc_index:
             if initiate:
-                self.nuclides.append(Nuclide(nuc_name))
-                nuclide = self.nuclides[-1]
+                nuclide = Nuclide(self, nuc_name)
+                row = len(self._nuc_names)
+                if row == len(self._nuc_ids):
+                    self._nuc_ids = resize_rows(self._nuc_ids, max(16, 2 * row))
+                    self._den = resize_rows(self._den, max(16, 2 * row))
+                self._nuc_ids[row] = nuclide.id
+                self._nuc_names.append(nuc_name)
+                self._nuc_index[nuc_name] = row
+                return nuclide
             else:
                 raise ValueError(f"Nuclide {nuc_name} not found")
-        return nuclide
+        return Nuclide(self, nuc_name)
 
     # def __getitem__(self, nuc_name):
     #     return self.check_nuclide(nuc_name, initiate=False)
@@ -199,23 +920,71 @@ class XSLIB():
         nuclide = self.check_nuclide(nuc_name)
         nuclide.den = den
 
-    def set_nuc_rec_rate(self, nuc_name, rec_name, rate):
+    def set_nuc_rec_rate(self, nuc_name, rec_name, rate, rate_std=None):
         """
         Shortcut to set the reaction rate of a reaction of a nuclide.
         
         :param nuc_name: str, name of the nuclide, like 'U235', 'Pu239', 'Xe135' etc.
         :param rec_name: str, name of the reaction, like '(n,gamma)', '(n,2n)', '(n,f)'etc.
         :param rate: array, reaction rate of the reaction.
+        :param rate_std: array, optional, standard deviation of the reaction rate.
         """
         nuclide = self.check_nuclide(nuc_name)
         reaction = nuclide.check_reaction(rec_name)
         reaction.rate = rate
+        if rate_std is not None:
+            reaction.rate_std = rate_std
+
+    def set_rates(self, nuc_names, rec_names, rates, rate_stds=None):
+        """
+        Set the reaction rates of many reactions at once.
+        
+        :param nuc_names: list, names of the nuclides, like 'U235', 'Pu239', 'Xe135' etc.
+        :param rec_names: list, names of the reactions, like '(n,gamma)', '(n,2n)', '(n,f)'etc.
+        :param rates: array, reaction rates of shape (n_reactions, n_burnups).
+        :param rate_stds: array, optional, standard deviations of the reaction rates.
+        """
+        for nuc_name in dict.fromkeys(nuc_names):
+            self.check_nuclide(nuc_name)
+        nuc_ids = array([parse_nuclide_name(nuc_name)[4] for nuc_name in nuc_names], dtype=int)
+        MTs = array([MT_dict[rec_name] for rec_name in rec_names], dtype=int)
+        if len(MTs) == 0:
+            return
+        self._add_entries(nuc_ids, MTs, asarray(rates, dtype=float), '_rate')
+        if rate_stds is not None:
+            self._add_entries(nuc_ids, MTs, asarray(rate_stds, dtype=float), '_rate_std')
+
+    def split_isomerics(self, isomerics):
+        """
+        Split the reaction rates into the ground and metastable states with the isomeric ratios, in one array operation.
+        The ground reactions keep rate*(1-ratio), and the 'M' reactions are added with rate*ratio.
+        It should be called only once, after all reaction rates are set.
+        
+        :param isomerics: ISOMERICS, the database of isomeric ratios.
+        """
+        rows, ratios = [], []
+        for (nuc_name, MT), ratio in isomerics.index.items():
+            if ratio > 0 and nuc_name in self._nuc_index and MT in MT_names and MT_names[MT] + 'M' in MT_dict \
+                    and (key := (int(self._nuc_ids[self._nuc_index[nuc_name]]), MT)) in self._entry_index:
+                rows.append(self._entry_index[key])
+                ratios.append(ratio)
+        if len(rows) == 0:
+            return
+        rows = array(rows)
+        ratios = array(ratios)[:, None]
+        nuc_ids = self._entry_nuc_id[rows]
+        MTs = array([MT_dict[MT_names[MT] + 'M'] for MT in self._entry_MT[rows].tolist()], dtype=int)
+        rates, rate_stds = self._rate[rows] * ratios, self._rate_std[rows] * ratios
+        self._rate[rows] *= 1 - ratios
+        self._rate_std[rows] *= 1 - ratios
+        self._add_entries(nuc_ids, MTs, rates, '_rate')
+        self._add_entries(nuc_ids, MTs, rate_stds, '_rate_std')
 
     def sort_nuclides(self):
         """
-        Sort the nuclide list by the nuclide ID.
+        Sort the nuclide table by the nuclide ID.
         """
-        self.nuclides.sort(key=lambda nuclide: nuclide.id)
+        self._select_nuclides(argsort(self._nuc_ids[:len(self._nuc_names)], kind='stable'))
 
     def format_nuclide(self, nuclide):
         return f"{nuclide.id:<8d} {nuclide.name:<8s} {len(nuclide.reactions):<8d}"
@@ -228,17 +997,22 @@ class XSLIB():
     
     def calculate_xs(self):
         """
-        Calculate the cross sections of the reactions.
+        Calculate the cross sections of all reactions in one array operation.
+        The relative uncertainties of the reaction rate and flux tallies are propagated into the cross sections,
+        assuming they are independent, while the densities from the depletion results are taken as exact.
         """
-        for nuclide in self.nuclides:
-            for reaction in nuclide.reactions:
-                reaction.xses = reaction.rate / (nuclide.den+1E-40) / self.flux
-                reaction.xses[nuclide.den==0] = 0
-                
-                # if the fluctuataion is too large, print a warning
-                # if reaction.xses.max() > 0 and reaction.xses.min()/reaction.xses.max() < 1E-3:
-                #     print(f"Warning: XS ratio for {nuclide.name} {reaction.MT} seems to be unstable")
-                #     print(f"\tMax: {reaction.xses.max():<8.2E} Min: {reaction.xses.min():<8.2E}")
+        dens = self._den[self._entry_nuc_rows()]
+        self._xs[:self._n_entries] = self.rate_matrix / (dens+1E-40) / self.flux
+        self._xs[:self._n_entries][dens==0] = 0
+
+        rate_rel = divide(self.rate_std_matrix, self.rate_matrix, out=zeros_like(self.rate_matrix), where=self.rate_matrix!=0)
+        flux_rel = self.flux_std / self.flux if self.flux_std is not None else zeros_like(self.flux)
+        self._xs_std[:self._n_entries] = abs(self.xs_matrix) * sqrt(rate_rel**2 + flux_rel**2)
+
+        # if the fluctuataion is too large, print a warning
+        # if reaction.xses.max() > 0 and reaction.xses.min()/reaction.xses.max() < 1E-3:
+        #     print(f"Warning: XS ratio for {nuclide.name} {reaction.MT} seems to be unstable")
+        #     print(f"\tMax: {reaction.xses.max():<8.2E} Min: {reaction.xses.min():<8.2E}")
 
     def remove_reactions(self, threshold):
         """
@@ -246,42 +1020,100 @@ class XSLIB():
         
         :param threshold: float, threshold of the cross section.
         """
-        for nuclide in self.nuclides:
-            nuclide.reactions = [reaction for reaction in nuclide.reactions if reaction.xses.mean() > threshold]
-        self.nuclides = [nuclide for nuclide in self.nuclides if len(nuclide.reactions) > 0]
+        self._select_entries(self.xs_matrix.mean(axis=1) > threshold)
+        self._select_nuclides(flatnonzero(isin(self._nuc_ids[:len(self._nuc_names)], self.entry_nuc_ids)))
         self.sort_nuclides()
     
     def remove_cooling(self):
         """
         Remove the reaction rate of the cooling phrases in the nuclide.reaction.rate.
+        A library of a single burnup step has no cooling phrase to remove.
         """
+        if len(self.burnups) < 2:
+            self.index_active = array([True] * len(self.burnups), dtype=bool)
+            return
         self.index_active = self.burnups[1:] != self.burnups[:-1]
         self.index_active = insert(self.index_active, -1, self.burnups[-2] != self.burnups[-1])
         self.burnups = self.burnups[self.index_active]
         self.flux = self.flux[self.index_active]
-        for nuclide in self.nuclides:
-            nuclide.den = nuclide.den[self.index_active]
-            for reaction in nuclide.reactions:
-                reaction.rate = reaction.rate[self.index_active]
+        if self.flux_std is not None:
+            self.flux_std = self.flux_std[self.index_active]
+        for name in ['_den'] + self._matrices:
+            setattr(self, name, getattr(self, name)[:, self.index_active])
+        self._width = int(self.index_active.sum())
 
-    def export(self, filepath=None):
+    def export(self, filepath=None, binary=False, compression=None, uncertainty=False):
         """
         Export to a cross section library file.
+        All lines are formatted in bulk and written through one buffer.
         
         :param filepath: str, optional, path to the cross section library file.
+        :param binary: bool, whether to also write the binary sidecar next to the file.
+        :param compression: str, optional, 'gzip' or 'zstd' to compress the file, whose suffix is appended when missing.
+        :param uncertainty: bool, whether to also write the relative uncertainties of the cross sections
+            into a companion table of the same layout, like 'xslib.dat.unc'.
+        The metadata, when not empty, is written next to the file, like 'xslib.dat.json'.
+        """
+        if filepath is None:
+            filepath = self.filepath
+        check_compression(compression)
+        if uncertainty:
+            xs_rel = divide(self.xs_std_matrix, self.xs_matrix, out=zeros_like(self.xs_matrix), where=self.xs_matrix!=0)
+            self._write(compressed_path(str(filepath) + '.unc', compression), abs(xs_rel),
+                        "********************* NUIT one-group neutron cross-section relative uncertainty *********************\n")
+        filepath = compressed_path(filepath, compression)
+        self._write(filepath, self.xs_matrix,
+                    "*************************** NUIT one-group neutron cross-section data ***************************\n")
+        if binary:
+            self.export_binary(filepath)
+        if self.metadata:
+            with open(metadata_path(filepath), 'w') as fileopen:
+                json.dump(self.metadata, fileopen, indent=2)
+
+    def _write(self, filepath, matrix, title):
+        """
+        Write a table of the library layout, with the values of 'matrix' for the entries.
+        
+        :param filepath: str, path to the file.
+        :param matrix: array, values of shape (n_entries, n_burnups), like the cross sections.
+        :param title: str, first line of the file.
+        """
+        n_nuclides = len(self._nuc_names)
+        rows = self._export_order()
+        nuc_rows = self._entry_nuc_rows()[rows]
+        ends = cumsum(bincount(nuc_rows, minlength=n_nuclides))
+        starts = ends - bincount(nuc_rows, minlength=n_nuclides)
+        nuc_lines = list(map("%-8d %-8s %-8d\n".__mod__, zip(self._nuc_ids[:n_nuclides].tolist(), self._nuc_names, (ends - starts).tolist())))
+        rec_format = "                  %-6d" + "   ".join(["%-12.8E"] * (self._width or 0)) + "\n"
+        rec_lines = list(map(rec_format.__mod__, map(tuple, column_stack([self.entry_MTs[rows], matrix[rows]]).tolist())))
+
+        buffer = [title,
+                  f"Number of isotopes with neutron data: \n\t{n_nuclides}\n",
+                  f"Number of burnup steps:\n\t{len(list(self.burnups))}\n\n",
+                  "BU(MWd/kgHM)\n",
+                  "   ".join(["%-12.8E" % burnup for burnup in self.burnups]) + "\n\n",
+                  "NucId    NucName  MT\n"]
+        for nuc_line, start, end in zip(nuc_lines, starts.tolist(), ends.tolist()):
+            buffer.append(nuc_line)
+            buffer.extend(rec_lines[start:end])
+        with open_library(filepath, 'w') as fileopen:
+            fileopen.write(''.join(buffer))
+
+    def export_binary(self, filepath=None):
+        """
+        Export the binary sidecar of a cross section library file, an uncompressed NPZ file with a fixed layout:
+        the burnup axis 'burnups', the nuclide table 'nuc_names' and 'nuc_ids',
+        the MT table 'entry_nuc_ids' and 'entry_MTs', and the dense xs matrix 'xs' in the export order.
+        
+        :param filepath: str, optional, path to the cross section library file, not the sidecar.
         """
         if filepath is None:
             filepath = self.filepath
-        fileopen = open(filepath, 'w')
-        fileopen.write("*************************** NUIT one-group neutron cross-section data ***************************\n" )
-        fileopen.write(f"Number of isotopes with neutron data: \n\t{len(self.nuclides)}\n")
-        fileopen.write(f"Number of burnup steps:\n\t{len(list(self.burnups))}\n\n")
-
-        fileopen.write("BU(MWd/kgHM)\n")
-        fileopen.write("   ".join([f"{burnup:<12.8E}" for burnup in self.burnups]) + "\n\n")
-        fileopen.write("NucId    NucName  MT\n")
-        for nuclide in self.nuclides:
-            nuclide.sort_reactions()
-            fileopen.write(self.format_nuclide(nuclide) + "\n")
-            for reaction in nuclide.reactions:
-                fileopen.write("                  " + self.format_reaction(reaction) + "\n")
+        rows = self._export_order()
+        savez(binary_path(filepath),
+              burnups=asarray(self.burnups, dtype=float),
+              nuc_names=array(self._nuc_names, dtype=str),
+              nuc_ids=self._nuc_ids[:len(self._nuc_names)],
+              entry_nuc_ids=self.entry_nuc_ids[rows],
+              entry_MTs=self.entry_MTs[rows],
+              xs=self.xs_matrix[rows])
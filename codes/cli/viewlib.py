@@ -5,6 +5,7 @@ import click
 import json
 import jinja2
 import re
+import sys
 
 
 from pathlib import Path
@@ -15,6 +16,9 @@ from classes import sys_path
 from classes import Manager, DatabaseManager
 from classes import run_in_folder
 
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from codes.classes import XSLIB
+
 @click.group()
 def cli():
     pass
@@ -286,6 +290,22 @@ def list(task):
     print("|================================================================================|")
 db.add_command(list)
 
+@click.command(help='Write the binary sidecars of the xslibs for fast loading.')
+@click.argument('task', type=str, default='')
+def pack(task):
+    xslib_list = DatabaseManager().get_xslib_list()
+    if task == '':
+        matched_xslib_list = xslib_list
+    else:
+        matched_xslib_list = [xslib for xslib in xslib_list if re.fullmatch(task, xslib['task'])]
+    for xslib in matched_xslib_list:
+        for file in Path(xslib['path']).glob('*.dat'):
+            library = XSLIB(file, read=False)
+            library.read(binary=False)
+            library.export_binary()
+            click.echo(f"Xslib {file} has been packed successfully.")
+db.add_command(pack)
+
 @click.command(help='Run a task.')
 @click.argument('task', type=str)
 @click.option('--inputs_template', '-it', type=str, help='The input parameters of the template.', required=False, multiple=True)
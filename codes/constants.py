@@ -1,5 +1,8 @@
 Na = 6.022140857e23
 
+# 能谱模式下由modify_openmc_input输出的多群截面文件
+MGXS_NAME = 'spectrum_mgxs.npz'
+
 MT_dict = {'(n,2n)': 16,
            '(n,3n)': 17,
            '(n,4n)': 37,
@@ -14,6 +17,7 @@ for key, val in MT_dict.items():
     else:
         MT_dict_copy[key+'M'] = val * 10 + 1
 MT_dict = MT_dict_copy
+MT_names = {val: key for key, val in MT_dict.items()}
 
 Atomic_list = ['H', 'He',
                'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
@@ -25,7 +29,21 @@ Atomic_list = ['H', 'He',
 Atomic_dict = {item: ind+1 for ind, item in enumerate(Atomic_list)}
 
 fissile_HM = ["U235", "U238", "Pu239", "Th232"]
+# 每MWd/kgHM燃耗对应的重金属裂变份额(FIMA)，按每次裂变200MeV、重金属质量数235估计
+fima_per_burnup = 86400E6 / (200E6 * 1.602176634E-19) * 235 / (Na * 1E3)
 
 time_convert_units = {'s': 1/86400, 'min': 1/1440, 'h': 1/24, 'd': 1, 'a': 365}
 def time_conversion(time, unit1, unit2):
     return time * time_convert_units[unit1] / time_convert_units[unit2]
+
+def active_steps(powers, timesteps):
+    """
+    Indexes of the depletion steps with a beginning-of-step statepoint, i.e. those with a nonzero power,
+    the last index being the end of the depletion with the power of the last step. Zero-power (cooling) steps are decay-only.
+
+    :param powers: list, powers or power densities of the steps.
+    :param timesteps: list, timesteps.
+
+    :return: list, sorted indexes.
+    """
+    return [step for step in range(len(timesteps) + 1) if powers[min(step, len(timesteps) - 1)] > 0]
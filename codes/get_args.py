@@ -33,6 +33,31 @@ def get_args(input_args=None):
     parser.add_argument("--batch", type=int, default=None)
     parser.add_argument("--inactive", type=int, default=None)
     parser.add_argument("--particles", type=int, default=None)
+    # 核素筛选
+    parser.add_argument("--screening", type=int, default=0)
+    parser.add_argument("--screening_threshold", type=float, default=1E-10)
+    parser.add_argument("--screening_reaction_ratio", type=float, default=100)
+    parser.add_argument("--screening_reaction_weight", type=float, default=None)
+    # 从output_path中已有的燃耗结果续算
+    parser.add_argument("--resume", type=int, default=0)
+    # 燃耗求解器
+    parser.add_argument("--integrator", type=str, default='predictor')
+    # 功率归一化方式
+    parser.add_argument("--normalization_mode", type=str, default='energy-deposition')
+    # 反应率统计方式
+    parser.add_argument("--reaction_mode", type=str, default='direct')
+    parser.add_argument("--spectrum_groups", type=str, default='UKAEA-1102')
+    parser.add_argument("--spectrum_temperature", type=float, default=294)
+    parser.add_argument("--spectrum_nuclides", type=str, default=['U235', 'U238', 'Pu239', 'Pu241', 'Xe135', 'Sm149'], nargs='*')
+    parser.add_argument("--mgxs_cache", type=str, default=None)
+    # 后处理并行进程数
+    parser.add_argument("--workers", type=int, default=1)
+    # 后处理缓存
+    parser.add_argument("--retrieve_cache", type=int, default=1)
+    # 截面库输出格式
+    parser.add_argument("--xslib_binary", type=int, default=0)
+    parser.add_argument("--xslib_compression", type=str, default=None)
+    parser.add_argument("--xslib_uncertainty", type=int, default=0)
 
     if input_args:
         args = parser.parse_args([])
@@ -0,0 +1,93 @@
+#-*-coding: UTF-8 -*-
+from os import getpid
+from pathlib import Path
+from hashlib import sha1
+from logging import info
+from numpy import array, zeros, interp, union1d, cumsum, concatenate, diff, searchsorted, save, load
+
+import openmc
+import openmc.data
+
+from .constants import MT_dict
+
+
+# 冗余反应道缺失时由分反应道求和
+MT_components = {18: [19, 20, 21, 38],
+                 103: list(range(600, 650)),
+                 107: list(range(800, 850))}
+
+
+def group_average(energy, xs, energies):
+    """
+    Average a pointwise cross section over energy groups with a flat weighting inside each group,
+    integrating the linear-linear interpolation exactly.
+
+    :param energy: array, energy grid of the cross section in eV.
+    :param xs: array, cross section on the energy grid in barn.
+    :param energies: array, group boundaries in eV, ascending.
+
+    :return: array, group cross sections.
+    """
+    grid = union1d(energy, energies)
+    values = interp(grid, energy, xs, left=0, right=0)
+    integral = concatenate([[0], cumsum((values[1:] + values[:-1]) / 2 * diff(grid))])
+    return diff(integral[searchsorted(grid, energies)]) / diff(energies)
+
+
+def nuclide_mgxs(filepath, MTs, energies, temperature):
+    """
+    Process the group cross sections of a nuclide from its OpenMC HDF5 library,
+    at the temperature of the library nearest to 'temperature'.
+
+    :param filepath: str, path to the HDF5 library of the nuclide.
+    :param MTs: list, MT numbers of the reactions.
+    :param energies: array, group boundaries in eV.
+    :param temperature: float, temperature in K.
+
+    :return: array of shape (reaction, group).
+    """
+    nuclide = openmc.data.IncidentNeutron.from_hdf5(filepath)
+    temperature_key = min(nuclide.temperatures, key=lambda key: abs(float(key[:-1]) - temperature))
+    mgxs = zeros((len(MTs), len(energies) - 1))
+    for index, MT in enumerate(MTs):
+        for component in ([MT] if MT in nuclide.reactions else MT_components.get(MT, [])):
+            if component in nuclide.reactions:
+                xs = nuclide.reactions[component].xs[temperature_key]
+                mgxs[index] += group_average(xs.x, xs.y, energies)
+    return mgxs
+
+
+def load_mgxs(cross_sections_path, nucs_name, recs_name, groups, temperature, cache_path):
+    """
+    Load the group cross sections of the nuclides and reactions, processing the libraries of cross_sections.xml
+    only for the nuclides not cached yet. The cache folder is keyed by the cross_sections.xml file,
+    the group structure and the temperature, and holds one .npy file per nuclide with all reactions of MT_dict.
+
+    :param cross_sections_path: Path, path to cross_sections.xml.
+    :param nucs_name: list, names of the nuclides.
+    :param recs_name: list, names of the reactions, like '(n,gamma)', 'fission'.
+    :param groups: str, name of the group structure in openmc.mgxs.GROUP_STRUCTURES.
+    :param temperature: float, temperature in K.
+    :param cache_path: Path, path to the cache folder.
+
+    :return: group boundaries, and array of shape (nuclide, reaction, group).
+    """
+    energies = array(openmc.mgxs.GROUP_STRUCTURES[groups])
+    MTs = sorted({MT for rec_name, MT in MT_dict.items() if not rec_name.endswith('M')})
+    stat = Path(cross_sections_path).stat()
+    key = sha1(f"{Path(cross_sections_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns};{groups};{temperature}".encode()).hexdigest()[:16]
+    cache_path = Path(cache_path) / key
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    library = openmc.data.DataLibrary.from_xml(cross_sections_path)
+    rec_rows = [MTs.index(MT_dict[rec_name]) for rec_name in recs_name]
+    mgxs = zeros((len(nucs_name), len(recs_name), len(energies) - 1))
+    for index, nuc_name in enumerate(nucs_name):
+        if not (filepath := cache_path / f'{nuc_name}.npy').exists():
+            info(f"处理多群截面: {nuc_name}")
+            # 先写临时文件再重命名，并行运行的算例不会读到不完整的缓存
+            temp_path = filepath.with_suffix(f'.{getpid()}.npy')
+            save(temp_path, nuclide_mgxs(library.get_by_material(nuc_name)['path'], MTs, energies, temperature))
+            temp_path.replace(filepath)
+        mgxs[index] = load(filepath)[rec_rows]
+    return energies, mgxs
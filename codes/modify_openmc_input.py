@@ -1,25 +1,167 @@
 #-*-coding: UTF-8 -*-
 
 import os
-import shutil
+import json
 
 from pathlib import Path
-from xml.dom.minidom import parse
 from time import time
-from logging import info, basicConfig, INFO
+from math import log
+from heapq import heapify, heappush, heappop
+from logging import info, basicConfig, getLogger, INFO, WARNING
 from argparse import Namespace
 
 import openmc
 from openmc.deplete import Chain
-from openmc.deplete import CoupledOperator, PredictorIntegrator
+from openmc.deplete import CoupledOperator, Results, comm
+from openmc.deplete.abc import OperatorResult
+from openmc.deplete import PredictorIntegrator, CECMIntegrator, CELIIntegrator, LEQIIntegrator, CF4Integrator, EPCRK4Integrator
 from openmc.deplete.coupled_operator import _get_nuclides_with_data
 
+from numpy import savez, isclose, cumsum
+from uncertainties import ufloat
+
+from .classes import GEOMETRY
+from .mgxs import load_mgxs
+from .constants import fissile_HM, fima_per_burnup, time_conversion, active_steps, MGXS_NAME
 from .get_args import get_args
 
+
+# 燃耗求解器，名称忽略大小写和'/'、'-'、'_'，如'CE/CM'、'le-qi'
+INTEGRATORS = {'predictor': PredictorIntegrator,
+               'cecm': CECMIntegrator,
+               'celi': CELIIntegrator,
+               'leqi': LEQIIntegrator,
+               'cf4': CF4Integrator,
+               'epcrk4': EPCRK4Integrator}
+# 随机隐式求解器只在第一步开始时输运，之后沿用上一步的反应率，不输出各步的statepoint，截面库无法使用
+SI_INTEGRATORS = ['siceli', 'sileqi']
+
+
+class DecayOnlyOperator(CoupledOperator):
+    """
+    CoupledOperator running the zero-power (cooling) steps as decay-only steps,
+    without transport solves and without writing their statepoints.
+    """
+    def __init__(self, *args, active_steps=None, **kwargs):
+        """
+        :param active_steps: set, indexes of the steps whose beginning-of-step statepoints are written,
+            the last index being the end of the depletion. All steps if None.
+        """
+        super().__init__(*args, **kwargs)
+        self.active_steps = active_steps
+
+    def __call__(self, vec, source_rate):
+        if source_rate == 0.0:
+            rates = self.reaction_rates.copy()
+            rates.fill(0.0)
+            return OperatorResult(ufloat(0.0, 0.0), rates)
+        return super().__call__(vec, source_rate)
+
+    def write_bos_data(self, step):
+        if self.active_steps is None or step in self.active_steps:
+            super().write_bos_data(step)
+
+
+def power_history(args, mass_HM):
+    """
+    Total time and burnup of the power history given by the timesteps and the powers or power densities.
+
+    :param args: Namespace, arguments of get_args.
+    :param mass_HM: float, heavy metal mass of the burnable materials in g, used with 'powers'.
+
+    :return: total time in d, and burnup in MWd/kgHM.
+    """
+    power_densities = args.power_densities if args.power_densities is not None else [power / mass_HM for power in args.powers]
+    history_time, history_burnup = 0.0, 0.0
+    for timestep, power_density in zip(args.timesteps, power_densities):
+        if args.timesteps_unit == 'MWd/kg':
+            history_time += timestep * 1000 / power_density if power_density > 0 else 0.0
+            history_burnup += timestep
+        else:
+            history_time += time_conversion(timestep, args.timesteps_unit, 'd')
+            history_burnup += time_conversion(timestep, args.timesteps_unit, 'd') * power_density / 1000
+    return history_time, history_burnup
+
+
+def mismatched_steps(results, args):
+    """
+    Steps of the saved depletion results whose time or power differs from the timesteps and powers of the arguments.
+    The times are not compared for burnup timesteps, and only the zero or nonzero powers are compared for power densities,
+    as the saved source rates are the powers of the whole burnable region.
+
+    :param results: openmc.deplete.Results, saved depletion results.
+    :param args: Namespace, arguments of get_args.
+
+    :return: list, indexes of the mismatched steps.
+    """
+    step_powers = args.powers if args.powers is not None else args.power_densities
+    step_times = [0.0] + list(cumsum([time_conversion(timestep, args.timesteps_unit, 's') for timestep in args.timesteps])) \
+        if args.timesteps_unit != 'MWd/kg' else None
+    mismatched = []
+    for step, result in enumerate(results):
+        power, source_rate = step_powers[min(step, len(args.timesteps) - 1)], result.source_rate[0]
+        if (args.powers is not None and not isclose(source_rate, power)) or (source_rate > 0) != (power > 0) or \
+                (step_times is not None and not isclose(result.time[0], step_times[step])):
+            mismatched.append(step)
+    return mismatched
+
+
+def screen_nuclides(chain, seeds, reaction_weight, history_time, threshold=1E-10):
+    """
+    Screen the chain nuclides able to reach a meaningful density from the seed nuclides over the power history,
+    with a cheap estimate instead of a pilot depletion. The weight of a path is the product of the decay branching ratios
+    times the decay probability over the history, min(1, ln2 * history_time / half_life), the fission yields
+    (maximum over the yield energies), and the reaction branching ratios, both times 'reaction_weight',
+    the rough probability of a neutron reaction of a nuclide over the history.
+    A nuclide is kept if its strongest path from any seed has a weight of at least 'threshold'.
+
+    :param chain: openmc.deplete.Chain, depletion chain.
+    :param seeds: list, names of the nuclides initially present in the burnable materials.
+    :param reaction_weight: float, weight of a neutron reaction.
+    :param history_time: float, total time of the power history in d.
+    :param threshold: float, minimum weight of the kept nuclides.
+
+    :return: list, names of the kept nuclides in the order of the chain.
+    """
+    # 最大乘积路径，即以-log(权重)为边长的最短路径
+    weights = {nuc_name: 1.0 for nuc_name in seeds if nuc_name in chain}
+    heap = [(-1.0, nuc_name) for nuc_name in weights]
+    heapify(heap)
+    while heap:
+        weight, nuc_name = heappop(heap)
+        weight = -weight
+        if weight < weights[nuc_name]:
+            continue
+        nuclide = chain[nuc_name]
+        decay_weight = min(1.0, log(2) * history_time * 86400 / nuclide.half_life) if nuclide.half_life else 1.0
+        edges = [(mode.target, mode.branching_ratio * decay_weight) for mode in nuclide.decay_modes]
+        edges.extend((reaction.target, reaction.branching_ratio * reaction_weight) for reaction in nuclide.reactions if reaction.type != 'fission')
+        if nuclide.yield_data is not None and any(reaction.type == 'fission' for reaction in nuclide.reactions):
+            yields = {}
+            for energy in nuclide.yield_energies:
+                for product, product_yield in nuclide.yield_data[energy].items():
+                    yields[product] = max(yields.get(product, 0), product_yield)
+            edges.extend((product, product_yield * reaction_weight) for product, product_yield in yields.items())
+        for target, edge_weight in edges:
+            if target is None or target not in chain or (target_weight := weight * edge_weight) < threshold:
+                continue
+            if target_weight > weights.get(target, 0):
+                weights[target] = target_weight
+                heappush(heap, (-target_weight, target))
+    return [nuclide.name for nuclide in chain.nuclides if nuclide.name in weights]
+
+
 def modify_openmc_input(args: Namespace):
 
     time_start = time()
     basicConfig(level=INFO, format="%(asctime)s %(message)s")
+    # MPI并行时只有0号进程输出运行信息，日志已被配置时basicConfig不生效，因此直接设置级别
+    if comm.rank != 0:
+        getLogger().setLevel(WARNING)
+
+    # 修改后的模型写入output_path，不能覆盖输入文件
+    if args.output_path.resolve() == args.input_path.resolve():
+        raise ValueError(f"Output path {args.output_path} is the input path, the input files would be overwritten")
 
     # 读取xml文件为openmc类实例
     info("XslibGenerator: 读取xml文件为openmc类实例...")
@@ -28,27 +170,14 @@ def modify_openmc_input(args: Namespace):
     settings_obj = openmc.Settings.from_xml(args.input_path / 'settings.xml')
     geometry_obj = openmc.Geometry.from_xml(args.input_path / 'geometry.xml', materials=materials_obj)
 
-    # 读取xml文件为xml树实例
-    info("XslibGenerator: 读取xml文件为xml树实例...")
-    materials_xml = parse(str(args.input_path / 'materials.xml'))
-    geometry_xml = parse(str(args.input_path / 'geometry.xml'))
-    tallies_xml = parse(str(args.input_path / 'tallies.xml'))
-    geometry_xml = parse(str(args.input_path / 'geometry.xml'))
-
-    # 将xml文件转储为tmp文件
-    info("XslibGenerator: 将xml文件转储为tmp文件...")
-    shutil.copy(str(args.input_path / 'materials.xml'), str(args.input_path / 'materials_original.xml'))
-    shutil.copy(str(args.input_path / 'geometry.xml'), str(args.input_path / 'geometry_original.xml'))
-    shutil.copy(str(args.input_path / 'tallies.xml'), str(args.input_path / 'tallies_original.xml'))
-    shutil.copy(str(args.input_path / 'settings.xml'), str(args.input_path / 'settings_original.xml'))
-    
-    # 读取主要xml元素
-    info("XslibGenerator: 读取主要xml元素...")
-    materials = materials_xml.getElementsByTagName('material')
-    cells = geometry_xml.getElementsByTagName('cell')
-    lattices = geometry_xml.getElementsByTagName('lattice')
-    filters = tallies_xml.getElementsByTagName('filter')
-    tallies = tallies_xml.getElementsByTagName('tally')
+    # 流式建立几何和材料索引，不保留xml树
+    info("XslibGenerator: 建立几何和材料索引...")
+    geometry = GEOMETRY(args.input_path / 'geometry.xml', args.input_path / 'materials.xml')
+
+    # 读取已有的筛选器和计数器编号
+    info("XslibGenerator: 读取已有的筛选器和计数器编号...")
+    existing_filter_id = {filter.id for tally in tallies_obj for filter in tally.filters}
+    existing_tally_id = {tally.id for tally in tallies_obj}
 
     # 读取燃耗链文件
     info("XslibGenerator: 读取燃耗链文件...")
@@ -77,70 +206,129 @@ def modify_openmc_input(args: Namespace):
     nucs_name = chain.nuclides
     nucs_name = [nuc.name for nuc in nucs_name if nuc.name in _get_nuclides_with_data(cross_section_path)]
 
+    # 筛选核素
+    if args.screening:
+        info("XslibGenerator: 筛选核素...")
+        screening_materials_id = set(geometry.burn_materials(args.burn_materials_index, args.burn_materials, args.burn_cells_index, args.burn_cells))
+        screening_materials_obj = [material for material in materials_obj if str(material.id) in screening_materials_id]
+        # 种子只取燃耗材料中实际存在的核素，与screened_nuclides.json中记录的一致
+        seeds = sorted({nuc_name for material in screening_materials_obj for nuc_name in material.get_nuclides()})
+        # 由功率历史估计总时间和燃耗，中子反应权重为 反应截面/重金属平均裂变截面 * FIMA
+        mass_HM = sum(material.get_mass(nuc_name) for material in screening_materials_obj for nuc_name in fissile_HM) if args.powers is not None else None
+        history_time, history_burnup = power_history(args, mass_HM)
+        reaction_weight = args.screening_reaction_weight
+        if reaction_weight is None:
+            reaction_weight = min(1.0, args.screening_reaction_ratio * history_burnup * fima_per_burnup)
+        info(f"XslibGenerator: 功率历史{history_time:.4g}d, 燃耗{history_burnup:.4g}MWd/kgHM, 中子反应权重{reaction_weight:.4g}")
+        screened_nucs_name = set(screen_nuclides(chain, seeds, reaction_weight, history_time, args.screening_threshold))
+        nucs_name = [nuc_name for nuc_name in nucs_name if nuc_name in screened_nucs_name]
+        info(f"XslibGenerator: 筛选后核素数: {len(nucs_name)}")
+        # 记录筛选参数和结果
+        if comm.rank == 0:
+            args.output_path.mkdir(parents=True, exist_ok=True)
+            with open(args.output_path / 'screened_nuclides.json', 'w') as fileopen:
+                json.dump({'history_time': history_time, 'history_burnup': history_burnup,
+                           'reaction_ratio': args.screening_reaction_ratio, 'reaction_weight': reaction_weight,
+                           'threshold': args.screening_threshold, 'seeds': seeds, 'nuclides': nucs_name}, fileopen, indent=2)
+
     # 处理燃耗材料和区域
     info("XslibGenerator: 处理燃耗材料和区域...")
-    burn_materials_id = [material.getAttribute('id') for material in materials if material.getAttribute(args.burn_materials_index) in args.burn_materials]
-    burn_cells_id = [cell.getAttribute('id') for cell in cells if cell.getAttribute(args.burn_cells_index) in args.burn_cells]
+    burn_materials_id = geometry.select_materials(args.burn_materials_index, args.burn_materials)
+    burn_cells_id = geometry.select_cells(args.burn_cells_index, args.burn_cells)
 
     # 添加材料筛选器
     info("XslibGenerator: 添加材料筛选器...")
     filter_mat_id = 10000
-    while filter_mat_id in [filter.getAttribute('id') for filter in filters]:
+    while filter_mat_id in existing_filter_id:
         filter_mat_id += 1
     filter_mat = openmc.MaterialFilter([int(id) for id in burn_materials_id], filter_mat_id)
 
     # 添加栅元筛选器
     info("XslibGenerator: 添加栅元筛选器...")
     filter_cell_id = 20000
-    while filter_cell_id in [filter.getAttribute('id') for filter in filters] or filter_cell_id == filter_mat_id:
+    while filter_cell_id in existing_filter_id or filter_cell_id == filter_mat_id:
         filter_cell_id += 1
     filter_cell = openmc.CellFilter([int(id) for id in burn_cells_id], filter_cell_id)
 
-    # 添加反应计数器
+    # 能谱模式下只对关键核素统计反应率，其余核素由能谱和多群截面折合
+    tally_nucs_name = nucs_name
+    if args.reaction_mode == 'spectrum':
+        tally_nucs_name = [nuc_name for nuc_name in nucs_name if nuc_name in args.spectrum_nuclides]
+        if len(tally_nucs_name) == 0:
+            raise ValueError(f"None of the spectrum nuclides {args.spectrum_nuclides} is in the chain with data")
+    elif args.reaction_mode != 'direct':
+        raise ValueError(f"Invalid reaction mode: {args.reaction_mode}")
+
+    # 添加反应计数器，每个反应道只与燃耗链中具有该反应的核素组合
     info("XslibGenerator: 添加反应计数器...")
+    nucs_recs_name = {nuclide.name: {reaction.type for reaction in nuclide.reactions} for nuclide in chain.nuclides}
+    tallies_reaction = []
     tally_reaction_id = 10000
-    existing_tally_id = [int(tally.getAttribute('id')) for tally in tallies]
-    while tally_reaction_id in existing_tally_id:
+    for rec_name in recs_name:
+        rec_nucs_name = [nuc_name for nuc_name in tally_nucs_name if rec_name in nucs_recs_name[nuc_name]]
+        if len(rec_nucs_name) == 0:
+            continue
+        while tally_reaction_id in existing_tally_id:
+            tally_reaction_id += 1
+        tally_reaction = openmc.Tally(tally_reaction_id, name=f"_tally_reaction_xslib_{rec_name}")
+        tally_reaction.nuclides = rec_nucs_name
+        tally_reaction.scores = [rec_name]
+        tallies_reaction.append(tally_reaction)
         tally_reaction_id += 1
-    tally_reaction = openmc.Tally(tally_reaction_id, name="_tally_reaction_xslib")
-    tally_reaction.nuclides = nucs_name
-    tally_reaction.scores = recs_name
 
     # 添加通量计数器
     info("XslibGenerator: 添加通量计数器...")
     tally_flux_id = 20000
-    while tally_flux_id in existing_tally_id or tally_flux_id == tally_reaction_id:
+    while tally_flux_id in existing_tally_id or tally_flux_id in [tally.id for tally in tallies_reaction]:
         tally_flux_id += 1
     tally_flux = openmc.Tally(tally_flux_id, name="_tally_flux_xslib")
     tally_flux.scores = ['flux']
 
+    # 添加能谱计数器，并准备多群截面
+    tallies_spectrum = []
+    if args.reaction_mode == 'spectrum':
+        info("XslibGenerator: 添加能谱计数器...")
+        tally_spectrum_id = 30000
+        while tally_spectrum_id in existing_tally_id:
+            tally_spectrum_id += 1
+        filter_energy_id = 30000
+        while filter_energy_id in existing_filter_id or filter_energy_id in [filter_mat_id, filter_cell_id]:
+            filter_energy_id += 1
+        tally_spectrum = openmc.Tally(tally_spectrum_id, name="_tally_spectrum_xslib")
+        tally_spectrum.scores = ['flux']
+        tallies_spectrum.append(tally_spectrum)
+
+        # 多群截面只由0号进程处理和保存，能群边界广播给其他进程
+        info("XslibGenerator: 准备多群截面...")
+        energies = None
+        if comm.rank == 0:
+            cache_path = Path(args.mgxs_cache) if args.mgxs_cache is not None else Path(__file__).parent.parent / 'files' / 'mgxs_cache'
+            energies, mgxs = load_mgxs(cross_section_path, nucs_name, recs_name, args.spectrum_groups, args.spectrum_temperature, cache_path)
+            # 与拆分的反应计数器一致，只保留燃耗链中具有的反应
+            for nuc_index, nuc_name in enumerate(nucs_name):
+                for rec_index, rec_name in enumerate(recs_name):
+                    if rec_name not in nucs_recs_name[nuc_name]:
+                        mgxs[nuc_index, rec_index] = 0
+            args.output_path.mkdir(parents=True, exist_ok=True)
+            savez(args.output_path / MGXS_NAME, energies=energies, nucs_name=nucs_name, recs_name=recs_name, mgxs=mgxs,
+                  groups=args.spectrum_groups, temperature=args.spectrum_temperature)
+        energies = comm.bcast(energies)
+
     # 组合计数器和筛选器
     info("XslibGenerator: 组合计数器和筛选器...")
-    if len(args.burn_materials) != 0:
-        tally_reaction.filters.append(filter_mat)
-        tally_flux.filters.append(filter_mat)
-    if len(args.burn_cells) != 0:
-        tally_reaction.filters.append(filter_cell)
-        tally_flux.filters.append(filter_cell)
-    tallies_obj.extend([tally_reaction, tally_flux])
+    for tally in tallies_reaction + [tally_flux] + tallies_spectrum:
+        if len(args.burn_materials) != 0:
+            tally.filters.append(filter_mat)
+        if len(args.burn_cells) != 0:
+            tally.filters.append(filter_cell)
+    # 能量筛选器放在最后，结果按(区域, 能群)展开
+    for tally in tallies_spectrum:
+        tally.filters.append(openmc.EnergyFilter(energies, filter_energy_id))
+    tallies_obj.extend(tallies_reaction + [tally_flux] + tallies_spectrum)
 
     # 解析栅元筛选器的材料
     info("XslibGenerator: 解析栅元筛选器的材料...")
-    burn_cells_materials_id = []
-    for cell_id in burn_cells_id:
-        cell = [cell for cell in cells if cell.getAttribute('id') == cell_id][0]
-        if cell.getAttribute('fill') == '':  # 体积为纯材料，没有填充其他
-            burn_cells_materials_id.extend(cell.getAttribute('material').split())
-        else:  # 栅元内使用了其他几何填充
-            subcells_id = [subcell.getAttribute('id') for subcell in cells if subcell.getAttribute('universe') == cell.getAttribute('fill')]
-            cell_lattice = [lattice for lattice in lattices if lattice.getAttribute('id') == cell.getAttribute('fill')][0]
-            cell_lattice_universes = cell_lattice.getElementsByTagName('universes')[0].firstChild.data.split()
-            cell_lattice_universes = list(set(cell_lattice_universes))
-            subcells_id_lattice = [subcell.getAttribute('id') for subcell in cells if subcell.getAttribute('universe') in cell_lattice_universes]
-            burn_cells_id.extend(subcells_id)
-            burn_cells_id.extend(subcells_id_lattice)
-    burn_materials_id.extend(burn_cells_materials_id)
-    burn_materials_id = list(set(burn_materials_id))
+    burn_materials_id = geometry.burn_materials(args.burn_materials_index, args.burn_materials, args.burn_cells_index, args.burn_cells)
 
     # 添加燃耗区核素
     info("XslibGenerator: 添加燃耗区核素...")
@@ -160,51 +348,91 @@ def modify_openmc_input(args: Namespace):
     settings_obj.inactive = args.inactive if args.inactive is not None else settings_obj.inactive
     settings_obj.batches = args.batch if args.batch is not None else settings_obj.batches
 
-    # 输出模型xml文件
-    info("XslibGenerator: 输出模型xml文件...")
-    materials_obj = openmc.Materials(geometry_obj.get_all_materials().values())
-    materials_obj.export_to_xml()
-    geometry_obj.export_to_xml()
-    tallies_obj.export_to_xml()
-    settings_obj.export_to_xml()
-    model = openmc.Model(geometry=geometry_obj,
-                        materials=materials_obj,
-                        settings = settings_obj, 
-                        tallies = tallies_obj)
-
-    # 设置燃耗求解器
-    info("XslibGenerator: 设置燃耗求解器...")
-    operator = CoupledOperator(model, 
-                                normalization_mode='energy-deposition',
-                                diff_burnable_mats=args.diff_burnable_mats)
-    integrator = PredictorIntegrator(operator=operator,
-                                    power=args.powers, 
-                                    power_density=args.power_densities,
-                                    timesteps=args.timesteps,
-                                    timestep_units=args.timesteps_unit,
-                                    solver='cram48')
-    integrator.integrate()
-
-    # 转储输出文件
-    info("XslibGenerator: 转储输出文件...")
-    if str(args.output_path) != str(Path().cwd()):
-        if not args.output_path.exists():
-            args.output_path.mkdir()
-        files = [file for file in Path().cwd().glob('*') if file.is_file()]
-        files = [file for file in files if file.stat().st_ctime > time_start and (file.suffix in ['.h5', '.out', '.log', '.xml'])]
-        for file in files:
-            shutil.copy(str(file), str(args.output_path))
-            if '_original' not in file.name:
-                os.remove(file)
-    shutil.copy(str(args.input_path / 'materials_original.xml'), str(args.input_path / 'materials.xml'))
-    shutil.copy(str(args.input_path / 'geometry_original.xml'), str(args.input_path / 'geometry.xml'))
-    shutil.copy(str(args.input_path / 'tallies_original.xml'), str(args.input_path / 'tallies.xml'))
-    shutil.copy(str(args.input_path / 'settings_original.xml'), str(args.input_path / 'settings.xml'))
-    os.remove(str(args.input_path / 'materials_original.xml'))
-    os.remove(str(args.input_path / 'geometry_original.xml'))
-    os.remove(str(args.input_path / 'tallies_original.xml'))
-    os.remove(str(args.input_path / 'settings_original.xml'))
-    
+    # 读取功率归一化方式
+    info("XslibGenerator: 读取功率归一化方式...")
+    fission_q = None
+    if args.normalization_mode == 'fission-q':
+        with open(Path(__file__).parent.parent / 'files' / 'serpent_fissq.json', 'r') as fileopen:
+            fission_q = json.load(fileopen)
+    elif args.normalization_mode != 'energy-deposition':
+        raise ValueError(f"Invalid normalization mode: {args.normalization_mode}")
+
+    # 选择燃耗求解器
+    info("XslibGenerator: 选择燃耗求解器...")
+    integrator_name = args.integrator.lower().replace('/', '').replace('-', '').replace('_', '')
+    if integrator_name in SI_INTEGRATORS:
+        raise ValueError(f"Integrator {args.integrator} writes no statepoint after the first step and is not supported, available: {list(INTEGRATORS)}")
+    if integrator_name not in INTEGRATORS:
+        raise ValueError(f"Invalid integrator: {args.integrator}, available: {list(INTEGRATORS)}")
+
+    # 切换到输出目录运行，输出文件直接写入output_path，输入目录和当前目录不被修改
+    info("XslibGenerator: 切换到输出目录...")
+    if comm.rank == 0:
+        args.output_path.mkdir(parents=True, exist_ok=True)
+    comm.barrier()
+    cwd = Path.cwd()
+    os.chdir(args.output_path)
+    try:
+        # 不续算时删除之前运行留下的statepoint和燃耗结果，避免混入截面库
+        if not args.resume and comm.rank == 0:
+            for stale_path in list(Path.cwd().glob('openmc_simulation_n*.h5')) + [Path('depletion_results.h5')]:
+                stale_path.unlink(missing_ok=True)
+        # 输出模型xml文件，MPI并行时只由0号进程写入
+        info("XslibGenerator: 输出模型xml文件...")
+        materials_obj = openmc.Materials(geometry_obj.get_all_materials().values())
+        if comm.rank == 0:
+            materials_obj.export_to_xml()
+            geometry_obj.export_to_xml()
+            tallies_obj.export_to_xml()
+            settings_obj.export_to_xml()
+        comm.barrier()
+        model = openmc.Model(geometry=geometry_obj,
+                            materials=materials_obj,
+                            settings = settings_obj, 
+                            tallies = tallies_obj)
+
+        # 检测已有的燃耗结果，从最后保存的燃耗步续算
+        # 结果文件的每一项为已完成燃耗步的步初数据，最后一步的步末原子数未保存，因此重算最后一步
+        prev_results, offset = None, 0
+        if args.resume and Path('depletion_results.h5').exists():
+            prev_results = Results('depletion_results.h5')
+            offset = len(prev_results) - 1
+            if offset > len(args.timesteps):
+                raise ValueError(f"Depletion results in {args.output_path} have {len(prev_results)} steps, more than the timesteps")
+            if (mismatched := mismatched_steps(prev_results, args)):
+                info(f"XslibGenerator: Warning: 已有燃耗结果第{mismatched}步的时间或功率与timesteps和功率不一致")
+            # 续算时反应率按上一步的功率缩放，零功率冷却步无法缩放，退回到最后一个有功率的燃耗步
+            while 0 < offset < len(args.timesteps) and prev_results[offset].source_rate[0] == 0:
+                offset -= 1
+            del prev_results[offset + 1:]
+            if offset < len(args.timesteps) and prev_results[offset].source_rate[0] == 0:
+                prev_results = None
+            info(f"XslibGenerator: 从第{offset}步续算...")
+
+        if offset < len(args.timesteps):
+            # 设置燃耗求解器
+            info("XslibGenerator: 设置燃耗求解器...")
+            # 零功率冷却步只计算衰变，不输运也不输出statepoint
+            operator = DecayOnlyOperator(model, 
+                                        active_steps=set(active_steps(args.powers if args.powers is not None else args.power_densities, args.timesteps)),
+                                        prev_results=prev_results,
+                                        normalization_mode=args.normalization_mode,
+                                        fission_q=fission_q,
+                                        diff_burnable_mats=args.diff_burnable_mats)
+            # 可选的求解器均在每步开始时输运并输出statepoint，且结果文件第一阶段为步初原子数，截面库燃耗网格不变
+            integrator = INTEGRATORS[integrator_name](operator=operator,
+                                            power=args.powers[offset:] if args.powers is not None else None, 
+                                            power_density=args.power_densities[offset:] if args.power_densities is not None else None,
+                                            timesteps=args.timesteps[offset:],
+                                            timestep_units=args.timesteps_unit,
+                                            solver='cram48')
+            integrator.integrate()
+        else:
+            info("XslibGenerator: 燃耗计算已完成，跳过...")
+        # 等待所有进程完成燃耗计算，之后可由0号进程提取结果
+        comm.barrier()
+    finally:
+        os.chdir(cwd)
 
     info("XslibGenerator: 运行结束")
     info("XslibGenerator: 运行时间: {:.2f}s".format(time() - time_start))
@@ -1,74 +1,244 @@
 #-*-coding: UTF-8 -*-
 from pathlib import Path
-from pandas import merge
-from functools import reduce
+from concurrent.futures import ProcessPoolExecutor
 
-from xml.dom.minidom import parse
-from numpy import array
+from numpy import array, sqrt, stack, zeros, zeros_like, maximum, savez, load, einsum
+from hashlib import sha1
+from h5py import File
 from time import time
 from logging import info, basicConfig, INFO
 from re import match
 
-basicConfig(level=INFO, format="%(asctime)s %(message)s")
-
-from openmc import StatePoint
-from openmc.deplete import Results
 from argparse import Namespace
 
-from .classes import XSLIB, ISOMERICS
-from .constants import fissile_HM, time_conversion, Na
+from .classes import XSLIB, ISOMERICS, GEOMETRY, check_compression
+from .constants import fissile_HM, time_conversion, active_steps, Na, MGXS_NAME
 from .get_args import get_args
 
 
+REACTION_TALLY = '_tally_reaction_xslib'
+FLUX_TALLY = '_tally_flux_xslib'
+SPECTRUM_TALLY = '_tally_spectrum_xslib'
+CACHE_PREFIX = 'retrieve_cache_'
+
+
+def read_tallies(filepath, prefixes=(REACTION_TALLY, FLUX_TALLY), optional=(SPECTRUM_TALLY,)):
+    """
+    Read the tallies named with the prefixes of a statepoint file with h5py, instead of building openmc.StatePoint with all its tallies.
+    Only the 'results' datasets and the filter, nuclide and score metadata of these tallies are read,
+    and the file is closed immediately.
+    The reaction tally is either one tally of all nuclides and scores, or split into one tally per score.
+    
+    :param filepath: str, path to the statepoint file.
+    :param prefixes: tuple, prefixes of the names of the tallies, each matching at least one tally.
+    :param optional: tuple, prefixes of the names of the tallies read if present.
+    
+    :return: dict of tally name to dict of 'filters' [(type, bins)], 'nuclides', 'scores',
+        and 'mean' and 'std_dev' arrays of shape (filter_bin, nuclide, score).
+    """
+    tallies = {}
+    with File(filepath, 'r') as fileopen:
+        tallies_group = fileopen['tallies']
+        tally_ids = tallies_group.attrs['ids'] if tallies_group.attrs['n_tallies'] > 0 else []
+        for tally_id in tally_ids:
+            tally_group = tallies_group[f'tally {tally_id}']
+            if 'name' not in tally_group or not (name := tally_group['name'][()].decode()).startswith(prefixes + optional):
+                continue
+            filters = []
+            if tally_group['n_filters'][()] > 0:
+                for filter_id in tally_group['filters'][()]:
+                    filter_group = tallies_group[f'filters/filter {filter_id}']
+                    filters.append((filter_group['type'][()].decode(), filter_group['bins'][()]))
+            nuclides = [nuclide.decode().strip() for nuclide in tally_group['nuclides'][()]]
+            scores = [score.decode() for score in tally_group['score_bins'][()]]
+
+            # the same statistics as openmc.Tally.mean and openmc.Tally.std_dev
+            n_realizations = tally_group['n_realizations'][()]
+            results = tally_group['results'][()]
+            sums = results[:, :, 0].reshape(-1, len(nuclides), len(scores))
+            sums_sq = results[:, :, 1].reshape(-1, len(nuclides), len(scores))
+            mean = sums / n_realizations
+            std_dev = zeros_like(mean)
+            if n_realizations > 1:
+                mask = mean != 0
+                std_dev[mask] = sqrt(maximum(sums_sq[mask] / n_realizations - mean[mask]**2, 0) / (n_realizations - 1))
+            tallies[name] = {'filters': filters, 'nuclides': nuclides, 'scores': scores, 'mean': mean, 'std_dev': std_dev}
+    if (missing := [prefix for prefix in prefixes if not any(name.startswith(prefix) for name in tallies)]):
+        raise ValueError(f"Tallies {missing} not found in {filepath}")
+    return tallies
+
+
+def get_tally_tensor(statepoints, name):
+    """
+    Stack the mean and standard deviation of a tally in all statepoints into tensors,
+    without building any pandas dataframe.
+    
+    :param statepoints: list, tallies read by read_tallies for all depletion steps.
+    :param name: str, name of the tally.
+    
+    :return: nuclides and scores of the tally, and mean and std. dev. tensors of shape (step, filter_bin, nuclide, score).
+    """
+    tallies = [statepoint[name] for statepoint in statepoints]
+    return tallies[0]['nuclides'], tallies[0]['scores'], stack([tally['mean'] for tally in tallies]), stack([tally['std_dev'] for tally in tallies])
+
+
+def get_reaction_tensor(statepoints):
+    """
+    Reassemble the reaction tallies split by score into one tensor of all nuclides and scores,
+    with zero rates for the (nuclide, score) pairs not tallied.
+    
+    :param statepoints: list, tallies read by read_tallies for all depletion steps.
+    
+    :return: nuclides and scores, and mean and std. dev. tensors of shape (step, filter_bin, nuclide, score).
+    """
+    names = [name for name in statepoints[0] if name.startswith(REACTION_TALLY)]
+    if len(names) == 1:
+        return get_tally_tensor(statepoints, names[0])
+    tensors = [get_tally_tensor(statepoints, name) for name in names]
+    nucs_name = list(dict.fromkeys(nuc_name for tensor in tensors for nuc_name in tensor[0]))
+    recs_name = list(dict.fromkeys(rec_name for tensor in tensors for rec_name in tensor[1]))
+    nucs_index = {nuc_name: index for index, nuc_name in enumerate(nucs_name)}
+    recs_index = {rec_name: index for index, rec_name in enumerate(recs_name)}
+    steps, bins = tensors[0][2].shape[:2]
+    mean = zeros((steps, bins, len(nucs_name), len(recs_name)))
+    std_dev = zeros_like(mean)
+    for tally_nucs_name, tally_recs_name, tally_mean, tally_std_dev in tensors:
+        rows = array([nucs_index[nuc_name] for nuc_name in tally_nucs_name])[:, None]
+        columns = array([recs_index[rec_name] for rec_name in tally_recs_name])[None, :]
+        mean[:, :, rows, columns] = tally_mean
+        std_dev[:, :, rows, columns] = tally_std_dev
+    return nucs_name, recs_name, mean, std_dev
+
+
+def read_atoms(filepath, materials_id, nucs_name):
+    """
+    Read the atom numbers of the materials and nuclides at all depletion steps from depletion_results.h5 at once,
+    instead of calling openmc.deplete.Results.get_atoms for every (material, nuclide) pair.
+    The same values as get_atoms with nuc_units='atoms' are returned, i.e. those at the beginning of each step.
+
+    :param filepath: str, path to the depletion results file.
+    :param materials_id: list, ids of the materials.
+    :param nucs_name: list, names of the nuclides.
+
+    :return: array of shape (step, material, nuclide).
+    """
+    with File(filepath, 'r') as fileopen:
+        materials_index = [fileopen['materials'][str(material_id)].attrs['index'] for material_id in materials_id]
+        nucs_index = []
+        for nuc_name in nucs_name:
+            if nuc_name not in fileopen['nuclides'] or 'atom number index' not in fileopen['nuclides'][nuc_name].attrs:
+                raise ValueError(f"Nuclide {nuc_name} not found in {filepath}")
+            nucs_index.append(fileopen['nuclides'][nuc_name].attrs['atom number index'])
+        # number: (燃耗步, 阶段, 材料, 核素)，取每步的第一阶段
+        atoms = fileopen['number'][:, 0]
+    return atoms[:, materials_index][:, :, nucs_index]
+
+
+def cache_key(filepaths):
+    """
+    Key of the retrieval cache, hashed from the names, sizes and modification times of the output files,
+    and the tallies and heavy metal nuclides extracted from them.
+    Hashing the contents of the statepoints would cost about as much as the tally reads the cache avoids.
+
+    :param filepaths: list, paths to the statepoint, depletion results and multigroup cross section files.
+
+    :return: str, hex digest.
+    """
+    digest = sha1()
+    for filepath in filepaths:
+        stat = Path(filepath).stat()
+        digest.update(f"{Path(filepath).name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    digest.update(f"{REACTION_TALLY};{FLUX_TALLY};{SPECTRUM_TALLY};{fissile_HM}".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_output(output_path, steps, workers=1, cache=True):
+    """
+    Read the flux and reaction rate tensors of the statepoints of the steps, and the atom numbers of all materials in depletion_results.h5.
+    Other statepoints in output_path, e.g. those left by an earlier run, are ignored.
+    The tensors are cached in an uncompressed .npz file in output_path, so that retrieving the same output again
+    (e.g. with another isomeric table or burnable region) skips HDF5 entirely.
+    The cache is rebuilt whenever any of the output files changes.
+
+    :param output_path: Path, path to the output folder.
+    :param steps: list, indexes of the depletion steps with a statepoint, as zero-power steps have none.
+    :param workers: int, number of processes to read the statepoints.
+    :param cache: bool, whether to use and write the cache.
+
+    :return: dict of 'nucs_name', 'recs_name', 'flux_mean', 'flux_std', 'reaction_mean', 'reaction_std',
+        ('spectrum_mean', 'spectrum_std' in the spectrum mode), tensors of shape (step, filter_bin, nuclide, score),
+        'steps', indexes of the depletion steps of the statepoints,
+        'materials_id', 'atoms_nucs_name' and 'atoms' of shape (all steps, material, nuclide) for atoms_nucs_name,
+        the tallied nuclides, the nuclides of the multigroup cross sections and fissile_HM.
+    """
+    files = [output_path / f'openmc_simulation_n{step}.h5' for step in steps]
+    if (missing := [file.name for file in files if not file.exists()]):
+        raise ValueError(f"Statepoints {missing} of the powered steps not found in {output_path}")
+    results_path = output_path / 'depletion_results.h5'
+    mgxs_path = output_path / MGXS_NAME
+    cache_path = output_path / f'{CACHE_PREFIX}{cache_key(files + [results_path] + ([mgxs_path] if mgxs_path.exists() else []))}.npz'
+    if cache and cache_path.exists():
+        info(f"读取缓存: {cache_path.name}")
+        with load(cache_path) as fileopen:
+            output = {key: fileopen[key] for key in fileopen.files}
+        for key in ['nucs_name', 'recs_name', 'steps', 'materials_id', 'atoms_nucs_name']:
+            output[key] = output[key].tolist()
+        return output
+
+    if workers > 1:
+        # 多进程读取，map保持燃耗步顺序，结果与串行读取一致
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            statepoints = list(executor.map(read_tallies, files))
+    else:
+        statepoints = [read_tallies(file) for file in files]
+    _, _, flux_mean, flux_std = get_tally_tensor(statepoints, FLUX_TALLY)
+    nucs_name, recs_name, reaction_mean, reaction_std = get_reaction_tensor(statepoints)
+    output = {'nucs_name': nucs_name, 'recs_name': recs_name, 'flux_mean': flux_mean, 'flux_std': flux_std,
+              'reaction_mean': reaction_mean, 'reaction_std': reaction_std, 'steps': list(steps)}
+    if SPECTRUM_TALLY in statepoints[0]:
+        _, _, output['spectrum_mean'], output['spectrum_std'] = get_tally_tensor(statepoints, SPECTRUM_TALLY)
+
+    mgxs_nucs_name = []
+    if mgxs_path.exists():
+        with load(mgxs_path) as fileopen:
+            mgxs_nucs_name = fileopen['nucs_name'].tolist()
+    with File(results_path, 'r') as fileopen:
+        materials_id = list(fileopen['materials'])
+    atoms_nucs_name = list(dict.fromkeys(list(nucs_name) + mgxs_nucs_name + fissile_HM))
+    output.update({'materials_id': materials_id, 'atoms_nucs_name': atoms_nucs_name,
+                   'atoms': read_atoms(results_path, materials_id, atoms_nucs_name)})
+
+    if cache:
+        for stale_path in output_path.glob(f'{CACHE_PREFIX}*.npz'):
+            stale_path.unlink()
+        # 先写临时文件再重命名，中断时不会留下损坏的缓存
+        temp_path = cache_path.with_suffix('.tmp')
+        with open(temp_path, 'wb') as fileopen:
+            savez(fileopen, **{key: array(value) for key, value in output.items()})
+        temp_path.replace(cache_path)
+        info(f"写入缓存: {cache_path.name}")
+    return output
+
+
 def retrieve_openmc_results(args: Namespace):
     
     time_start = time()
     basicConfig(level=INFO, format="%(asctime)s %(message)s")
+    # 在读取输出前检查截面库压缩格式
+    check_compression(args.xslib_compression)
 
     # 读取输入文件
     info("读取输入文件...")
-    materials_xml = parse(str(args.output_path / 'materials.xml'))
-    geometry_xml = parse(str(args.output_path / 'geometry.xml'))
-    materials = materials_xml.getElementsByTagName('material')
-    cells = geometry_xml.getElementsByTagName('cell')
-    lattices = geometry_xml.getElementsByTagName('lattice')
+    geometry = GEOMETRY(args.output_path / 'geometry.xml', args.output_path / 'materials.xml')
 
     # 读取输出文件
     info("读取输出文件...")
-    result = Results(args.output_path / 'depletion_results.h5')
-    statepoints = []
-    for file in sorted(args.output_path.glob('openmc_simulation_n*.h5'), key=lambda x: int(x.name[19:-3])):
-        # info(f"读取输出文件{file.stem}...")
-        statepoints.append(StatePoint(file))
-
-    # 整理计数器数据为数据表对象列表
-    info("整理计数器数据为数据表对象列表...")
-    dfs_tally_flux = []
-    dfs_tally_reaction = []
-    for i, file in enumerate(statepoints):
-        df_tally_flux = file.get_tally(name='_tally_flux_xslib').get_pandas_dataframe()
-        if 'mean' not in df_tally_flux.columns:
-            df_tally_flux.insert(len(df_tally_flux.columns), 'mean', 1E-10)
-        df_tally_flux = df_tally_flux.rename(columns={'mean': 'mean_' + str(i)})
-        df_tally_flux.drop('std. dev.', axis=1, inplace=True)
-        dfs_tally_flux.append(df_tally_flux)
-
-        df_tally_reaction = file.get_tally(name='_tally_reaction_xslib').get_pandas_dataframe()
-        if 'mean' not in df_tally_reaction.columns:
-            df_tally_reaction.insert(len(df_tally_reaction.columns), 'mean', 0)
-        df_tally_reaction = df_tally_reaction.rename(columns={'mean': 'mean_' + str(i)})
-        df_tally_reaction.drop('std. dev.', axis=1, inplace=True)
-        dfs_tally_reaction.append(df_tally_reaction)
-
-    # 合并列表得到通量和反应率数据表
-    info("合并列表得到通量和反应率数据表...")
-    tags_tally_flux = df_tally_flux.columns.tolist()[:-1]
-    tags_tally_reaction = df_tally_reaction.columns.tolist()[:-1]
-    tags_data = [f'mean_{i}' for i in range(len(dfs_tally_flux))]
-    merge_flux = lambda t1, t2: merge(t1, t2, on=tags_tally_flux)
-    merge_reaction = lambda t1, t2: merge(t1, t2, on=tags_tally_reaction)
-    df_flux = reduce(merge_flux, dfs_tally_flux)
-    df_reaction = reduce(merge_reaction, dfs_tally_reaction)
+    # 只读取有功率的燃耗步的statepoint，零功率冷却步没有statepoint
+    steps = active_steps(args.powers if args.powers is not None else args.power_densities, args.timesteps)
+    output = read_output(args.output_path, steps, args.workers, bool(args.retrieve_cache))
+    nucs_name, recs_name = output['nucs_name'], output['recs_name']
+    flux_mean, flux_std = output['flux_mean'], output['flux_std']
+    reaction_mean, reaction_std = output['reaction_mean'], output['reaction_std']
 
     # 初始化截面库
     info("初始化截面库...")
@@ -78,39 +248,32 @@ def retrieve_openmc_results(args: Namespace):
     # 读取体积
     info("读取体积...")
     # 读取燃耗材料和燃耗区域的填充材料
-    burn_materials_id = [material.getAttribute('id') for material in materials if material.getAttribute(args.burn_materials_index) in args.burn_materials]
-    burn_cells_id = [cell.getAttribute('id') for cell in cells if cell.getAttribute(args.burn_cells_index) in args.burn_cells]
-    burn_cells_materials_id = []
-    for cell_id in burn_cells_id:
-        cell = [cell for cell in cells if cell.getAttribute('id') == cell_id][0]
-        if cell.getAttribute('fill') == '':
-            burn_cells_materials_id.extend(cell.getAttribute('material').split())
-        else:
-            subcells_id = [subcell.getAttribute('id') for subcell in cells if subcell.getAttribute('universe') == cell.getAttribute('fill')]
-            cell_lattice = [lattice for lattice in lattices if lattice.getAttribute('id') == cell.getAttribute('fill')][0]
-            cell_lattice_universes = cell_lattice.getElementsByTagName('universes')[0].firstChild.data.split()
-            cell_lattice_universes = list(set(cell_lattice_universes))
-            subcells_id_lattice = [subcell.getAttribute('id') for subcell in cells if subcell.getAttribute('universe') in cell_lattice_universes]
-            burn_cells_id.extend(subcells_id)
-            burn_cells_id.extend(subcells_id_lattice)
-    burn_materials_id.extend(burn_cells_materials_id)
-    burn_materials_id = list(set(burn_materials_id))
-    burn_materials_volume = sum([float(material.getAttribute('volume')) for material in materials if material.getAttribute('id') in burn_materials_id])
+    burn_materials_id = geometry.burn_materials(args.burn_materials_index, args.burn_materials, args.burn_cells_index, args.burn_cells)
+    burn_materials_volume = geometry.volume(burn_materials_id)
+
+    # 读取原子数
+    info("读取原子数...")
+    # 对燃耗材料求和，得到(燃耗步, 核素)原子数
+    if (missing := [material_id for material_id in burn_materials_id if material_id not in output['materials_id']]):
+        raise ValueError(f"Materials {missing} not found in depletion results")
+    atoms = output['atoms'][:, [output['materials_id'].index(material_id) for material_id in burn_materials_id]].sum(axis=1)
 
     # 读取重金属质量
     info("读取重金属质量...")
-    mass_HM = 0
+    nucs_M = []
     for nuc_name in fissile_HM:
         match_result = match(r'^([a-zA-Z]+)(\d+)_?(m[123])?$', nuc_name)
         if match_result is None:
             raise ValueError(f"Invalid nuclide name: {nuc_name}")
         else:
-            nuc_M = int(match_result.group(2))
-        mass_HM += sum([result.get_atoms(burn_material_id, nuc=nuc_name, nuc_units='atoms')[1][0] for burn_material_id in burn_materials_id]) / Na * nuc_M
+            nucs_M.append(int(match_result.group(2)))
+    atoms_index = {nuc_name: index for index, nuc_name in enumerate(output['atoms_nucs_name'])}
+    mass_HM = (atoms[0, [atoms_index[nuc_name] for nuc_name in fissile_HM]] * array(nucs_M)).sum() / Na
 
     # 读取通量和燃耗
     info("读取通量和燃耗...")
-    xslib.flux = df_flux[tags_data].to_numpy().sum(axis=0)
+    xslib.flux = flux_mean[:, :, 0, 0].sum(axis=1)
+    xslib.flux_std = sqrt((flux_std[:, :, 0, 0]**2).sum(axis=1))
     if args.timesteps_unit == 'MWd/kg':
         xslib.burnups = [sum(args.timesteps[:i+1]) for i in range(len(args.timesteps))]
     else:
@@ -122,37 +285,66 @@ def retrieve_openmc_results(args: Namespace):
             powers = array(args.powers)
             xslib.burnups = [sum(times[:i+1]*powers[:i+1])/1000/mass_HM for i in range(len(args.timesteps))]
     xslib.burnups.insert(0, 0)
-    xslib.burnups = array(xslib.burnups)
+    # 对齐燃耗网格和有功率的燃耗步
+    if len(xslib.burnups) != len(atoms):
+        raise ValueError(f"Depletion results have {len(atoms)} steps, but the timesteps give {len(xslib.burnups)}")
+    xslib.burnups = array(xslib.burnups)[steps]
+    atoms = atoms[steps]
 
     # 读取核素密度
     info("读取核素密度...")
-    # 仍然依赖depletion results 
-    nucs_name = df_reaction['nuclide'].unique()
-    for nuc_name in nucs_name:
-        atom_dens = [result.get_atoms(burn_material_id, nuc=nuc_name, nuc_units='atoms')[1] for burn_material_id in burn_materials_id]
-        # print(nuc_name, atom_dens, burn_materials_id)
-        atom_dens = array(atom_dens).sum(axis=0) / burn_materials_volume / 1E24
-        if any(array(atom_dens) < 0):
+    mgxs_nucs_name = []
+    if 'spectrum_mean' in output:
+        with load(args.output_path / MGXS_NAME) as fileopen:
+            mgxs_nucs_name, mgxs_recs_name, mgxs = fileopen['nucs_name'].tolist(), fileopen['recs_name'].tolist(), fileopen['mgxs']
+    lib_nucs_name = list(dict.fromkeys(nucs_name + mgxs_nucs_name))
+    atoms_dens = atoms[:, [atoms_index[nuc_name] for nuc_name in lib_nucs_name]].T / burn_materials_volume / 1E24
+    for nuc_name, atom_dens in zip(lib_nucs_name, atoms_dens):
+        if any(atom_dens < 0):
             info(f"Warning:[{nuc_name}] negative atom_dens")
             atom_dens[atom_dens < 0] = 0
-        nuc_name = nuc_name.replace('_', '')
-        xslib.set_nuc_den(nuc_name, atom_dens)
+        xslib.set_nuc_den(nuc_name.replace('_', ''), atom_dens)
 
     # 读取反应率
     info("读取反应率...")
-    for i, serie in df_reaction.iterrows():
-        rate = serie[tags_data].to_numpy()
-        m_ratio = isomerics(serie['nuclide'], serie['score'])
-        xslib.set_nuc_rec_rate(serie['nuclide'].replace('_', ''), serie['score'], rate * (1 - m_ratio))
-        if m_ratio > 0:
-            xslib.set_nuc_rec_rate(serie['nuclide'].replace('_', ''), serie['score'] + 'M', rate * m_ratio)
+    # 对筛选器求和，并整理为(核素*反应道, 燃耗步)
+    rates = reaction_mean.sum(axis=1).transpose(1, 2, 0).reshape(len(nucs_name) * len(recs_name), -1)
+    rates_std = sqrt((reaction_std**2).sum(axis=1)).transpose(1, 2, 0).reshape(len(nucs_name) * len(recs_name), -1)
+    xslib.set_rates([nuc_name.replace('_', '') for nuc_name in nucs_name for _ in recs_name], list(recs_name) * len(nucs_name),
+                    rates, rates_std)
+
+    # 由能谱和多群截面折合单群截面，未直接统计的核素的反应率取为 密度*截面*通量
+    if 'spectrum_mean' in output:
+        info("由能谱和多群截面折合单群截面...")
+        # 对区域求和，得到(燃耗步, 能群)能谱
+        spectrum = output['spectrum_mean'][:, :, 0, 0].reshape(len(xslib.flux), -1, mgxs.shape[2]).sum(axis=1)
+        xses = einsum('nrg,tg->nrt', mgxs, spectrum) / spectrum.sum(axis=1)
+        # 用直接统计的关键核素检验折合截面
+        direct_rates = rates.reshape(len(nucs_name), len(recs_name), -1)
+        for mgxs_index, nuc_name in enumerate(mgxs_nucs_name):
+            if nuc_name not in nucs_name:
+                continue
+            for rec_name in [rec_name for rec_name in recs_name if rec_name in mgxs_recs_name]:
+                direct_xs = direct_rates[nucs_name.index(nuc_name), recs_name.index(rec_name)] / (atoms_dens[lib_nucs_name.index(nuc_name)] + 1E-40) / xslib.flux
+                collapsed_xs = xses[mgxs_index, mgxs_recs_name.index(rec_name)]
+                if direct_xs.mean() > 0:
+                    info(f"[{nuc_name}] {rec_name}: 直接统计 {direct_xs.mean():.4E}, 能谱折合 {collapsed_xs.mean():.4E}, 偏差 {collapsed_xs.mean()/direct_xs.mean()-1:+.2%}")
+        collapsed = [mgxs_index for mgxs_index, nuc_name in enumerate(mgxs_nucs_name) if nuc_name not in nucs_name]
+        collapsed_dens = atoms_dens[[lib_nucs_name.index(mgxs_nucs_name[mgxs_index]) for mgxs_index in collapsed]]
+        collapsed_rates = (xses[collapsed] * collapsed_dens[:, None, :] * xslib.flux).reshape(len(collapsed) * len(mgxs_recs_name), -1)
+        xslib.set_rates([mgxs_nucs_name[mgxs_index].replace('_', '') for mgxs_index in collapsed for _ in mgxs_recs_name],
+                        list(mgxs_recs_name) * len(collapsed), collapsed_rates)
+    xslib.split_isomerics(isomerics)
 
     # 生成截面并导入截面库
     info("生成截面并导入截面库...")
     xslib.remove_cooling()
     xslib.calculate_xs()
     xslib.remove_reactions(1E-7)
-    xslib.export()
+    xslib.metadata.update({'normalization_mode': args.normalization_mode, 'reaction_mode': args.reaction_mode})
+    if args.normalization_mode == 'fission-q':
+        xslib.metadata['fission_q'] = 'files/serpent_fissq.json'
+    xslib.export(binary=bool(args.xslib_binary), compression=args.xslib_compression, uncertainty=bool(args.xslib_uncertainty))
     
     info("XslibGenerator: 运行结束")
     info("XslibGenerator: 运行时间: {:.2f}s".format(time() - time_start))
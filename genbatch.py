@@ -0,0 +1,21 @@
+import sys
+import json
+
+from argparse import ArgumentParser
+
+from codes.batch import run_batch
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    # 算例参数文件，内容为get_args参数字典的列表
+    parser.add_argument("--cases", type=str, required=True)
+    parser.add_argument("--max_parallel", type=int, default=1)
+    parser.add_argument("--threads_per_job", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.cases, 'r') as fileopen:
+        cases = json.load(fileopen)
+    results = run_batch(cases, args.max_parallel, args.threads_per_job)
+    sys.exit(0 if all(result['status'] == 'done' for result in results) else 1)
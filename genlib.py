@@ -1,3 +1,5 @@
+from openmc.deplete import comm
+
 from codes import *
 
 
@@ -5,5 +7,6 @@ if __name__ == "__main__":
 
     args = get_args()
     modify_openmc_input(args)
-    retrieve_openmc_results(args)
-    
\ No newline at end of file
+    # MPI并行时所有进程共同完成输运和燃耗，结果只由0号进程提取一次
+    if comm.rank == 0:
+        retrieve_openmc_results(args)